@@ -0,0 +1,200 @@
+"""Time the cycler's hot paths outside Kodi, against synthetic libraries.
+
+service.py runs on the stand-in xbmc/xbmcvfs/xbmcaddon modules in
+scripts/kodistub. For each library size a Kodi home is laid out under the
+work directory. The real shaders and textures are symlinked in, and the
+library is padded with more links to them under new names. The benchmarks are:
+
+  load_cold      load_shaders() with no shader index in addon_data
+  load_warm      load_shaders() with the index cached
+  select         one playlist pick (ShaderCycler.playlist.next)
+  settings       update_settings_xml() switching to a different shader
+  settings_same  update_settings_xml() for the shader already set
+  cycle          cycle_shaders() with the screensaver up: pick, rotation
+                 log, settings.xml and the simulated deactivate/activate
+
+Nothing waits on the wall clock: the cycler's scheduler and the event waits
+in set_shader run on the stub's simulated clock (xbmc.clock), and the stub
+answers DeactivateScreensaver/ActivateScreensaver synchronously, so a run
+only measures the cycler's own work. Times are milliseconds per call, the
+median of --repeat runs. With
+--baseline a previous --json result is compared and the exit status is 1
+when anything got more than --tolerance slower, for CI.
+
+    python scripts/bench_cycler.py
+    python scripts/bench_cycler.py --sizes 500 5000 --json bench.json
+    python scripts/bench_cycler.py --baseline bench.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPTS_DIR)
+CYCLER_DIR = os.path.join(REPO_ROOT, 'service.shadertoy.cycler')
+SCREENSAVER_RESOURCES = os.path.join(REPO_ROOT, 'screensaver.shadertoy', 'resources')
+NOISE_FLOOR_MS = 0.05 # Differences below this are never reported as regressions
+
+sys.path[:0] = [os.path.join(SCRIPTS_DIR, 'kodistub'), CYCLER_DIR]
+
+import xbmc
+import xbmcvfs
+
+SETTINGS_XML = ('<settings version="2"><setting id="shader"></setting><setting id="ownshader">false</setting>'
+                '<setting id="texture0" /><setting id="texture1" /><setting id="texture2" /><setting id="texture3" /></settings>')
+
+
+def build_home(root, size):
+    # Kodi home with 'size' shaders, the real library first, padded with renamed links to it
+    shader_dir = os.path.join(root, 'addons', 'screensaver.shadertoy', 'resources', 'shaders')
+    os.makedirs(shader_dir)
+    real = sorted(name for name in os.listdir(os.path.join(SCREENSAVER_RESOURCES, 'shaders'))
+                  if name.endswith('.frag.glsl') and not name.startswith('-'))
+    for i in range(size):
+        source = real[i % len(real)]
+        name = source if i < len(real) else f'{source[:-len(".frag.glsl")]}-{i}.frag.glsl'
+        os.symlink(os.path.join(SCREENSAVER_RESOURCES, 'shaders', source), os.path.join(shader_dir, name))
+    for name in os.listdir(SCREENSAVER_RESOURCES):
+        if name.lower().endswith(('.png', '.jpg')):
+            os.symlink(os.path.join(SCREENSAVER_RESOURCES, name), os.path.join(shader_dir, '..', name))
+    settings_dir = os.path.join(root, 'userdata', 'addon_data', 'screensaver.shadertoy')
+    os.makedirs(settings_dir)
+    with open(os.path.join(settings_dir, 'settings.xml'), 'w', encoding='utf-8') as f:
+        f.write(SETTINGS_XML)
+    return os.path.join(settings_dir, 'settings.xml')
+
+
+def load_service(root, settings_path):
+    # Fresh service module pointed at 'root', with background work that would skew timings off
+    xbmc.reset()
+    xbmcvfs.home = root
+    xbmcvfs.profile = os.path.join(root, 'userdata')
+    if 'service' in sys.modules:
+        service = importlib.reload(sys.modules['service'])
+    else:
+        service = importlib.import_module('service')
+    service.SETTINGS_PATH = settings_path
+    service.SetToTester = 0
+    service.RESTRICT_TO_FIXED_SHADERS = 0
+    service.TEXTURE_MAX_SIZE = 0
+    service.MINIFY_SHADERS = 0
+    service.PREFETCH_BUDGET_MB = 0
+    service.HOT_RELOAD = 0
+    service.LAZY_START = 0
+    service.PREVIEW_OVERLAY = 0
+    service.SWITCH_MODE = 1 # Mode 0 sleeps 2 s per switch by design
+    return service
+
+
+def simulate_time(cycler):
+    # Put the cycler's timers and switch waits on xbmc.clock: a wait on an event that is not
+    # set yet advances the simulated clock by its timeout instead of blocking
+    cycler.scheduler.clock = xbmc.clock.monotonic
+    for event in (cycler.switch_cancelled, cycler.deactivated_event, cycler.activated_event):
+        def wait(timeout=None, event=event):
+            if not event.is_set() and timeout:
+                xbmc.clock.advance(timeout)
+            return event.is_set()
+        event.wait = wait
+    return cycler
+
+
+def timed(fn, calls):
+    # Milliseconds per call over 'calls' calls
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - started) * 1000 / calls
+
+
+def bench_size(size, repeat, calls, work_dir):
+    root = os.path.join(work_dir, f'home-{size}')
+    settings_path = build_home(root, size)
+    service = load_service(root, settings_path)
+    cycler = simulate_time(service.ShaderCycler())
+    shaders = cycler.all_shaders
+    if len(shaders) != size:
+        raise RuntimeError(f'expected {size} shaders, the cycler loaded {len(shaders)}')
+
+    def load_cold(i):
+        os.remove(service.SHADER_INDEX_PATH)
+        cycler.load_shaders()
+
+    def settings(i):
+        cycler.update_settings_xml(shaders[i % len(shaders)])
+
+    def settings_same(i):
+        cycler.update_settings_xml(shaders[0])
+
+    cases = [
+        ('load_cold', load_cold, 1),
+        ('load_warm', lambda i: cycler.load_shaders(), 1),
+        ('select', lambda i: cycler.playlist.next(), calls),
+        ('settings', settings, calls),
+        ('settings_same', settings_same, calls),
+        ('cycle', lambda i: cycler.cycle_shaders(), calls),
+    ]
+    results = {}
+    for name, fn, n in cases:
+        if name == 'cycle':
+            xbmc.set_screensaver(True)
+        results[name] = round(statistics.median(timed(fn, n) for _ in range(repeat)), 4)
+    xbmc.set_screensaver(False)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Lines describing regressions against 'baseline'
+    regressions = []
+    for key, ms in sorted(results.items()):
+        before = baseline.get(key)
+        if before is not None and ms > before * (1 + tolerance) and ms - before > NOISE_FLOOR_MS:
+            regressions.append(f'{key}: {before:.3f} -> {ms:.3f} ms ({(ms / before - 1) * 100:+.0f}%)')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shader cycler's hot paths without Kodi.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000], help='library sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the median is reported')
+    parser.add_argument('--calls', type=int, default=200, help='calls per run for the per-switch benchmarks')
+    parser.add_argument('--json', metavar='PATH', help='write {benchmark@size: ms} to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='earlier --json output to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    parser.add_argument('--work-dir', help='where to build the synthetic homes (default: a temp dir, removed after)')
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='shadertoy-bench-')
+    results = {}
+    try:
+        for size in args.sizes:
+            for name, ms in bench_size(size, args.repeat, args.calls, work_dir).items():
+                results[f'{name}@{size}'] = ms
+                print(f'{name:<14} {size:>6} shaders  {ms:>10.3f} ms')
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'Slower: {line}')
+        if regressions:
+            return 1
+        print(f'No regressions beyond {args.tolerance:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
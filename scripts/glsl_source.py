@@ -0,0 +1,95 @@
+"""Small helpers for reading Shadertoy GLSL sources from Python tools.
+
+These are text-level helpers, not a GLSL parser: they understand comments,
+object-like #defines, const scalars and brace/paren nesting, which is enough
+for the library tools in this directory.
+"""
+
+import ast
+import operator
+import re
+
+DEFINE_RE = re.compile(r'^[ \t]*#[ \t]*define[ \t]+([A-Za-z_]\w*)(?![\w(])[ \t]*(.*)$', re.MULTILINE)
+CONST_RE = re.compile(r'\bconst\s+(?:int|uint|float)\s+([A-Za-z_]\w*)\s*=\s*([^;]+);')
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+NUMBER_SUFFIX_RE = re.compile(r'(?<=[\d.])[uUfF]\b')
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+
+def strip_comments(source):
+    """Remove // and /* */ comments, keeping line breaks (GLSL has no string literals)."""
+    return COMMENT_RE.sub(lambda m: '\n' * m.group(0).count('\n') or ' ', source)
+
+
+def read_source(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def find_matching(text, start, open_char='{', close_char='}'):
+    """Index of the bracket closing the one at text[start], or len(text) if unbalanced."""
+    depth = 0
+    for i in range(start, len(text)):
+        c = text[i]
+        if c == open_char:
+            depth += 1
+        elif c == close_char:
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(text)
+
+
+def eval_number(expr, symbols=None, _depth=0):
+    """Evaluate a constant scalar expression, resolving names through 'symbols'.
+
+    Returns None when the expression is not a compile-time number.
+    """
+    symbols = symbols or {}
+    expr = NUMBER_SUFFIX_RE.sub('', expr.strip())
+    # GLSL float literals such as '1.' or '.5' are valid Python already
+    expr = re.sub(r'\b(?:int|float|uint)\s*\(', '(', expr)
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError:
+        return None
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = visit(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return _BINARY_OPS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.Name) and node.id in symbols and _depth < 8:
+            value = eval_number(str(symbols[node.id]), symbols, _depth + 1)
+            if value is None:
+                raise ValueError(node.id)
+            return value
+        raise ValueError(ast.dump(node))
+
+    try:
+        return visit(tree)
+    except (ValueError, ZeroDivisionError, TypeError):
+        return None
+
+
+def symbols(code):
+    """Object-like #defines and const scalars of comment-free 'code' as {name: text}."""
+    table = {}
+    for name, value in DEFINE_RE.findall(code):
+        table[name] = value.strip()
+    for name, value in CONST_RE.findall(code):
+        table.setdefault(name, value.strip())
+    return table
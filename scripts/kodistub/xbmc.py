@@ -0,0 +1,117 @@
+"""Stand-in for Kodi's xbmc module, enough to run service.py outside Kodi.
+
+Put scripts/kodistub first on sys.path. State lives at module level so a
+harness can drive it:
+
+  clock           simulated time, advanced by sleep() and Monitor.waitForAbort();
+                  clock.monotonic can stand in for time.monotonic
+  screensaver     whether System.ScreenSaverActive is true
+  fps             what System.FPS reports
+  log_records     (level, message) of every xbmc.log call, newest last
+  builtins        every executebuiltin() command, newest last
+
+Activate/DeactivateScreensaver flip 'screensaver' and call the matching
+callback on every Monitor synchronously, the way the cycler expects Kodi to.
+"""
+
+import collections
+
+LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR, LOGFATAL = 0, 1, 2, 3, 4
+LOG_ECHO_LEVEL = None # Print messages at or above this level, None = keep them quiet
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, seconds):
+        self.now += max(seconds, 0)
+
+    def monotonic(self):
+        # Drop-in for time.monotonic, e.g. as a Scheduler clock
+        return self.now
+
+
+clock = SimClock()
+screensaver = False
+fps = 60.0
+abort_requested = False
+log_records = collections.deque(maxlen=10000)
+builtins = collections.deque(maxlen=10000)
+monitors = []
+
+
+def reset():
+    global screensaver, fps, abort_requested
+    clock.now = 0.0
+    screensaver = False
+    fps = 60.0
+    abort_requested = False
+    log_records.clear()
+    builtins.clear()
+    del monitors[:]
+
+
+def log(msg, level=LOGDEBUG):
+    log_records.append((level, msg))
+    if LOG_ECHO_LEVEL is not None and level >= LOG_ECHO_LEVEL:
+        print(msg)
+
+
+def sleep(ms):
+    clock.advance(ms / 1000)
+
+
+def getCondVisibility(condition):
+    if condition == 'System.ScreenSaverActive':
+        return screensaver
+    return False
+
+
+def getInfoLabel(label):
+    if label == 'System.FPS':
+        return f'{fps:.1f}'
+    return ''
+
+
+def set_screensaver(active):
+    # Change the screensaver state and tell every Monitor, as Kodi would
+    global screensaver
+    if active == screensaver:
+        return
+    screensaver = active
+    for monitor in list(monitors):
+        if active:
+            monitor.onScreensaverActivated()
+        else:
+            monitor.onScreensaverDeactivated()
+
+
+def executebuiltin(command, wait=False):
+    builtins.append(command)
+    if command == 'ActivateScreensaver':
+        set_screensaver(True)
+    elif command == 'DeactivateScreensaver':
+        set_screensaver(False)
+
+
+class Monitor:
+    def __init__(self):
+        monitors.append(self)
+
+    def abortRequested(self):
+        return abort_requested
+
+    def waitForAbort(self, timeout=-1):
+        if timeout is not None and timeout >= 0:
+            clock.advance(timeout)
+        return abort_requested
+
+    def onScreensaverActivated(self):
+        pass
+
+    def onScreensaverDeactivated(self):
+        pass
+
+    def onNotification(self, sender, method, data):
+        pass
@@ -0,0 +1,39 @@
+"""Stand-in for Kodi's xbmcaddon module.
+
+Addon() without an id is service.shadertoy.cycler. Its 'path' is the
+cycler's directory in this repository (so resources/bindings.json is the
+real one) and its 'profile' is addon_data/<id>/ below xbmcvfs.profile.
+"""
+
+import os
+
+import xbmcvfs
+
+DEFAULT_ID = 'service.shadertoy.cycler'
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+paths = {DEFAULT_ID: os.path.join(REPO_ROOT, DEFAULT_ID)}
+
+
+class Addon:
+    def __init__(self, id=None):
+        self.id = id or DEFAULT_ID
+        self.settings = {}
+
+    def getAddonInfo(self, key):
+        if key == 'id':
+            return self.id
+        if key == 'path':
+            return paths.get(self.id, os.path.join(xbmcvfs.home, 'addons', self.id))
+        if key == 'profile':
+            return os.path.join(xbmcvfs.profile, 'addon_data', self.id) + os.sep
+        if key == 'name':
+            return self.id
+        if key == 'version':
+            return '0.0.0'
+        return ''
+
+    def getSetting(self, key):
+        return self.settings.get(key, '')
+
+    def setSetting(self, key, value):
+        self.settings[key] = value
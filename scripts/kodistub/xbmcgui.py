@@ -0,0 +1,47 @@
+"""Stand-in for Kodi's xbmcgui module: the window and image control the cycler uses.
+
+Nothing is drawn. Every window that is shown is appended to 'shown', so a
+harness can check what the preview overlay put on screen and whether it
+was closed again.
+"""
+
+shown = [] # WindowDialog instances, in the order show() was called
+
+
+class ControlImage:
+    def __init__(self, x, y, width, height, filename, aspectRatio=0, colorDiffuse=None):
+        self.rect = (x, y, width, height)
+        self.filename = filename
+        self.aspect_ratio = aspectRatio
+        self.animations = []
+
+    def setImage(self, filename, useCache=True):
+        self.filename = filename
+
+    def setAnimations(self, animations):
+        self.animations = list(animations)
+
+
+class WindowDialog:
+    def __init__(self):
+        self.controls = []
+        self.visible = False
+
+    def getWidth(self):
+        return 1280
+
+    def getHeight(self):
+        return 720
+
+    def addControl(self, control):
+        self.controls.append(control)
+
+    def addControls(self, controls):
+        self.controls.extend(controls)
+
+    def show(self):
+        self.visible = True
+        shown.append(self)
+
+    def close(self):
+        self.visible = False
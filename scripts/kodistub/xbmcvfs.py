@@ -0,0 +1,42 @@
+"""Stand-in for Kodi's xbmcvfs module over the local file system.
+
+special:// paths resolve below 'home' (special://home) and 'profile'
+(special://profile, i.e. userdata). Both default to directories named by
+the KODI_STUB_HOME and KODI_STUB_PROFILE environment variables and can be
+reassigned before service.py is imported.
+"""
+
+import os
+
+home = os.environ.get('KODI_STUB_HOME', os.path.join(os.getcwd(), 'kodi-home'))
+profile = os.environ.get('KODI_STUB_PROFILE', os.path.join(home, 'userdata'))
+
+
+def translatePath(path):
+    for prefix, root in (('special://home/', home), ('special://profile/', profile),
+                         ('special://userdata/', profile), ('special://temp/', os.path.join(home, 'temp')),
+                         ('special://logpath/', os.path.join(home, 'temp'))):
+        if path.startswith(prefix):
+            return os.path.join(root, path[len(prefix):])
+    return path
+
+
+def exists(path):
+    return os.path.exists(translatePath(path))
+
+
+def mkdirs(path):
+    os.makedirs(translatePath(path), exist_ok=True)
+    return True
+
+
+def listdir(path):
+    # (dirs, files) like Kodi's, empty when the directory is missing
+    dirs, files = [], []
+    try:
+        with os.scandir(translatePath(path)) as it:
+            for entry in it:
+                (dirs if entry.is_dir() else files).append(entry.name)
+    except OSError:
+        pass
+    return dirs, files
@@ -0,0 +1,188 @@
+"""Build the Shader-Screens thumbnails and the README gallery, incrementally.
+
+Every full-resolution screenshot in screensaver.shadertoy/Shader-Screens gets
+a WIDTH px wide thumbnail in Shader-Screens/thumbnails, named like the hand-made
+ones ("<name> (Custom).png"). thumbnails/manifest.json keeps the content hash
+of the screenshot each thumbnail was made from, so a run only resizes new or
+changed screenshots (spread over a process pool) and deletes thumbnails whose
+screenshot is gone. The manifest holds no timestamps, so a fresh checkout (CI)
+does not rewrite it.
+
+The README block between <!-- THUMBNAIL_START --> and <!-- THUMBNAIL_END -->
+is rewritten, in the HTML the old JavaScript generator produced, only when
+the manifest changed (or with --update-readme).
+
+Needs Pillow (pip install Pillow).
+
+    python scripts/make_thumbnails.py
+    python scripts/make_thumbnails.py --jobs 4 --force
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SCREENS_DIR = 'screensaver.shadertoy/Shader-Screens'
+THUMBNAILS_DIR = 'screensaver.shadertoy/Shader-Screens/thumbnails'
+README_PATH = 'README.md'
+MANIFEST_NAME = 'manifest.json'
+START_MARKER = '<!-- THUMBNAIL_START -->'
+END_MARKER = '<!-- THUMBNAIL_END -->'
+THUMB_SUFFIX = ' (Custom)'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+WIDTH = 128
+MANIFEST_VERSION = 1
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def thumbnail_name(screen_name):
+    return f'{os.path.splitext(screen_name)[0]}{THUMB_SUFFIX}.png'
+
+
+def make_thumbnail(src_path, dst_path, width):
+    # Runs in a worker process; written to a temp name first so an interrupted
+    # run never leaves a truncated thumbnail behind
+    with Image.open(src_path) as img:
+        height = max(1, round(img.height * width / img.width))
+        thumb = img.convert('RGB').resize((width, height), Image.LANCZOS)
+    tmp_path = dst_path + '.tmp'
+    thumb.save(tmp_path, 'PNG', optimize=True)
+    os.replace(tmp_path, dst_path)
+    return dst_path
+
+
+def load_manifest(path, width):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('width') != width:
+        return {'version': MANIFEST_VERSION, 'width': width, 'screens': {}}
+    return manifest
+
+
+def plan(screens_dir, thumbnails_dir, manifest, force):
+    # (new screens entries, [(screen name, entry)] that need a thumbnail)
+    screens, todo = {}, []
+    with os.scandir(screens_dir) as it:
+        entries = sorted((entry for entry in it if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)),
+                         key=lambda entry: entry.name)
+    for entry in entries:
+        old = manifest['screens'].get(entry.name)
+        record = {'hash': file_hash(entry.path), 'thumbnail': thumbnail_name(entry.name)}
+        screens[entry.name] = record
+        if force or old != record or not os.path.exists(os.path.join(thumbnails_dir, record['thumbnail'])):
+            todo.append((entry.name, record))
+    return screens, todo
+
+
+def gallery_html(screens):
+    # Same markup as the old JavaScript generator, ordered by thumbnail file name like its readdir
+    links = []
+    for name, record in sorted(screens.items(), key=lambda item: item[1]['thumbnail']):
+        base = os.path.splitext(name)[0]
+        links.append(
+            f'<a href="{SCREENS_DIR}/{name}?raw=true" target="full_image_viewer" rel="noopener noreferrer" style="display: inline-block; text-decoration: none;">'
+            f'<img src="{THUMBNAILS_DIR}/{record["thumbnail"]}?raw=true" alt="Thumbnail of {base}" width="128" style="border: 1px solid #ddd; border-radius: 4px; box-shadow: 2px 2px 5px rgba(0,0,0,0.2); max-width: 100%; height: auto;">'
+            f'</a>'
+        )
+    return '&nbsp;&nbsp;'.join(links)
+
+
+def update_readme(path, html):
+    # True if README changed; raises when the markers are missing
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    start = text.find(START_MARKER)
+    end = text.find(END_MARKER)
+    if start == -1 or end == -1 or end < start:
+        raise ValueError(f'{START_MARKER} / {END_MARKER} not found in {path}')
+    updated = f'{text[:start + len(START_MARKER)]}\n{html}\n{text[end:]}'
+    if updated == text:
+        return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(updated)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Make Shader-Screens thumbnails and the README gallery.')
+    parser.add_argument('--screens', default=SCREENS_DIR, help='full-resolution screenshots')
+    parser.add_argument('--thumbnails', default=THUMBNAILS_DIR, help='thumbnail directory, holds manifest.json')
+    parser.add_argument('--readme', default=README_PATH, help='README holding the gallery markers')
+    parser.add_argument('--update-readme', action='store_true', help='rewrite the gallery even if nothing changed')
+    parser.add_argument('--width', type=int, default=WIDTH, help='thumbnail width in pixels')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--force', action='store_true', help='remake every thumbnail')
+    args = parser.parse_args(argv)
+    if Image is None:
+        print('Pillow is not installed (pip install Pillow)')
+        return 2
+
+    os.makedirs(args.thumbnails, exist_ok=True)
+    manifest_path = os.path.join(args.thumbnails, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path, args.width)
+    screens, todo = plan(args.screens, args.thumbnails, manifest, args.force)
+
+    failed = []
+    if todo:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {pool.submit(make_thumbnail, os.path.join(args.screens, name),
+                                   os.path.join(args.thumbnails, record['thumbnail']), args.width): name
+                       for name, record in todo}
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append(name)
+                    # Keep whatever thumbnail there was; the hash still differs, so it is retried next run
+                    if name in manifest['screens']:
+                        screens[name] = manifest['screens'][name]
+                    else:
+                        del screens[name]
+                    print(f'{name}: {e}')
+
+    removed = 0
+    for name, record in manifest['screens'].items():
+        if name not in screens and os.path.exists(os.path.join(args.thumbnails, record['thumbnail'])):
+            if not any(other['thumbnail'] == record['thumbnail'] for other in screens.values()):
+                os.remove(os.path.join(args.thumbnails, record['thumbnail']))
+                removed += 1
+
+    changed = screens != manifest['screens']
+    if changed:
+        manifest['screens'] = screens
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+            f.write('\n')
+    print(f'{len(screens)} screenshots: {len(todo) - len(failed)} thumbnails made, {removed} removed, {len(failed)} failed')
+
+    if changed or args.update_readme:
+        try:
+            rewritten = update_readme(args.readme, gallery_html(screens))
+        except (OSError, ValueError) as e:
+            print(str(e))
+            return 1
+        print(f'{args.readme} {"updated" if rewritten else "already up to date"}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
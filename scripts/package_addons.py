@@ -0,0 +1,356 @@
+"""Package the two addons with only the files something actually refers to.
+
+A reference graph is built from the bottom up for each addon:
+
+screensaver.shadertoy
+  - addon.xml and what it names: the library_linux .so, icon, fanart and
+    screenshots. resources/settings.xml and resources/language/ are added too.
+  - the shaders the cycler can select and their duplicates, as decided by
+    scripts/prune_shaders.py from service.py. That is FIXED_SHADERS while
+    RESTRICT_TO_FIXED_SHADERS is 1, or every selectable shader with
+    --all-shaders. The main_* pipeline shaders are always included.
+  - every texture that the cycler's bindings.json binds to one of those
+    shaders. Fallback chains are resolved exactly as the service does it.
+  - #include files of those shaders.
+  - the shaders and textures of the built-in presets, taken from the file
+    names inside the .so (--no-presets leaves them out).
+  - with --previews, the Shader-Screens/<shader>.png screenshot of each
+    cycled shader, shown by the cycler's preview overlay during a switch.
+
+service.shadertoy.cycler
+  - addon.xml, the service library it names and every module that library
+    imports from the addon directory, plus resources/.
+
+Each kept shader is preprocessed with glsl_minify (no dead #ifdef branches,
+no comments) to see which iChannels it really samples. A sampled channel
+with no binding gets black from the screensaver. A binding on a channel the
+shader never samples loads a texture for nothing. Both are listed.
+
+The report lists orphaned files (on disk, referenced by nothing) by size and
+missing ones (referenced, not on disk). The exit status is 1 when the cycler
+refers to something that is missing. Built-in presets whose shader was
+replaced are only listed.
+
+--out DIR syncs DIR/<addon id>/, hard-linking where possible and deleting
+what no longer belongs there. --zip DIR writes DIR/<addon id>-<version>.zip.
+Entries are sorted and carry a fixed timestamp, so an unchanged addon always
+gives a byte-identical zip.
+
+    python scripts/package_addons.py
+    python scripts/package_addons.py --zip dist
+    python scripts/package_addons.py --all-shaders --no-presets --out build
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import shutil
+import sys
+import xml.etree.ElementTree as ET
+import zipfile
+
+import glsl_source
+import prune_shaders
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), 'service.shadertoy.cycler'))
+
+import bindings
+import glsl_minify
+
+SCREENSAVER_DIR = 'screensaver.shadertoy'
+CYCLER_DIR = 'service.shadertoy.cycler'
+SHADER_SUBDIR = os.path.join('resources', 'shaders')
+TEXTURE_SUBDIR = 'resources'
+PREVIEW_SUBDIR = 'Shader-Screens'
+# File names in the .so's preset table; main_* are left to PIPELINE_PREFIX, the
+# string table also holds fragments glued to their neighbours
+PRESET_RE = re.compile(rb'[A-Za-z0-9_\-]+\.(?:frag\.glsl|png|jpe?g)')
+CHANNEL_RE = re.compile(r'\biChannel([0-3])\b')
+ALWAYS = (os.path.join('resources', 'settings.xml'), os.path.join('resources', 'language'))
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.ogv', '.zip') # Already compressed, deflate only costs time
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class Package:
+    def __init__(self, addon_dir):
+        self.addon_dir = addon_dir
+        self.files = {} # rel_path -> why it is in the package (first reason found)
+        self.missing = {} # rel_path -> who refers to it
+
+    def add(self, rel_path, why):
+        rel_path = os.path.normpath(rel_path)
+        path = os.path.join(self.addon_dir, rel_path)
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for name in sorted(file_names):
+                    self.add(os.path.relpath(os.path.join(dir_path, name), self.addon_dir), why)
+        elif os.path.isfile(path):
+            self.files.setdefault(rel_path, why)
+        else:
+            self.missing.setdefault(rel_path, why)
+
+    def orphans(self):
+        # (rel_path, size) of every file below addon_dir that is not packaged, largest first
+        found = []
+        for dir_path, dir_names, file_names in os.walk(self.addon_dir):
+            for name in file_names:
+                rel_path = os.path.relpath(os.path.join(dir_path, name), self.addon_dir)
+                if rel_path not in self.files:
+                    found.append((rel_path, os.path.getsize(os.path.join(dir_path, name))))
+        return sorted(found, key=lambda item: (-item[1], item[0]))
+
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.addon_dir, rel_path)) for rel_path in self.files)
+
+
+def addon_info(addon_dir):
+    # (id, version, library, [asset paths]) from addon.xml
+    root = ET.parse(os.path.join(addon_dir, 'addon.xml')).getroot()
+    library, assets = None, []
+    for extension in root.iter('extension'):
+        library = library or extension.get('library_linux') or extension.get('library')
+        for asset in extension.iter('assets'):
+            assets.extend(child.text.strip() for child in asset if child.text and child.text.strip())
+    return root.get('id'), root.get('version'), library, assets
+
+
+def add_addon_xml(package):
+    addon_id, version, library, assets = addon_info(package.addon_dir)
+    package.add('addon.xml', 'addon')
+    if library:
+        package.add(library, 'addon.xml library')
+    for asset in assets:
+        package.add(asset, 'addon.xml asset')
+    return addon_id, version, library
+
+
+def preset_names(library_path):
+    with open(library_path, 'rb') as f:
+        data = f.read()
+    return sorted({name.decode() for name in PRESET_RE.findall(data)
+                   if not name.startswith(prune_shaders.PIPELINE_PREFIX.encode())})
+
+
+def channel_usage(shader_dir, name):
+    # (iChannel numbers the live code samples, #include files), comments and dead branches ignored
+    source = glsl_source.read_source(os.path.join(shader_dir, name))
+    try:
+        code, includes = glsl_minify.minify(source, shader_dir)
+    except glsl_minify.MinifyError:
+        code, includes = glsl_source.strip_comments(source), []
+    return {int(n) for n in CHANNEL_RE.findall(code)}, includes
+
+
+def screensaver_package(addon_dir, all_shaders, presets, previews=False):
+    package = Package(addon_dir)
+    addon_id, version, library = add_addon_xml(package)
+    for rel_path in ALWAYS:
+        package.add(rel_path, 'screensaver settings')
+
+    shader_dir = os.path.join(addon_dir, SHADER_SUBDIR)
+    texture_dir = os.path.join(addon_dir, TEXTURE_SUBDIR)
+    settings = prune_shaders.service_lists(prune_shaders.SERVICE_PATH)
+    bound = prune_shaders.bound_shaders(prune_shaders.BINDINGS_PATH)
+    library_sources = prune_shaders.walk(shader_dir, '')
+    unreachable, selectable = prune_shaders.classify(library_sources, settings)
+    fixed_only = settings['RESTRICT_TO_FIXED_SHADERS'] == 1 and not all_shaders
+    names, dropped = prune_shaders.deployment(library_sources, selectable, settings, bound, fixed_only)
+    on_disk = {source.rel_path for source in library_sources}
+    for name in names:
+        package.add(os.path.join(SHADER_SUBDIR, name), 'pipeline' if name.startswith(prune_shaders.PIPELINE_PREFIX) else 'cycler')
+    if fixed_only:
+        for name in settings['FIXED_SHADERS']:
+            if name not in on_disk:
+                package.add(os.path.join(SHADER_SUBDIR, name), 'FIXED_SHADERS')
+
+    manifest = bindings.load_manifest(prune_shaders.BINDINGS_PATH)
+    table, _ = bindings.compile_bindings(manifest, texture_dir, set(os.listdir(texture_dir)))
+    unbound, unused = [], []
+    for name in names:
+        if name.startswith(prune_shaders.PIPELINE_PREFIX) or name not in on_disk:
+            continue
+        binding = bindings.lookup(table, name)
+        for path in binding.values():
+            if path:
+                package.add(os.path.relpath(path, addon_dir), f'bound to {name}')
+        used, includes = channel_usage(shader_dir, name)
+        for include in includes:
+            package.add(os.path.relpath(include, addon_dir), f'included by {name}')
+        for n, channel in enumerate(bindings.CHANNELS):
+            if n in used and not binding[channel]:
+                unbound.append(f'{name} iChannel{n}')
+            elif n not in used and binding[channel]:
+                unused.append(f'{name} iChannel{n} ({os.path.basename(binding[channel])})')
+    # Rules for packaged shaders whose whole fallback chain is absent; fallbacks taken are fine
+    shipped = set(names)
+    for rule in manifest.get('rules', []):
+        users = [name for name in rule['shaders'] if name in shipped]
+        for channel in bindings.CHANNELS:
+            chain = rule.get(channel)
+            chain = [chain] if isinstance(chain, str) else chain or []
+            if users and chain and not any(os.path.isfile(os.path.join(texture_dir, name)) for name in chain):
+                package.missing.setdefault(os.path.join(TEXTURE_SUBDIR, chain[0]), f"bindings.json {channel} of {', '.join(users)}")
+
+    preview_missing = []
+    if previews:
+        for name in names:
+            if name.startswith(prune_shaders.PIPELINE_PREFIX):
+                continue
+            rel_path = os.path.join(PREVIEW_SUBDIR, name[:-len(prune_shaders.SHADER_SUFFIX)] + '.png')
+            if os.path.isfile(os.path.join(addon_dir, rel_path)):
+                package.add(rel_path, f'preview of {name}')
+            else:
+                preview_missing.append(name)
+
+    preset_missing = []
+    if presets and library:
+        for name in preset_names(os.path.join(addon_dir, library)):
+            sub_dir = SHADER_SUBDIR if name.endswith('.glsl') else TEXTURE_SUBDIR
+            if os.path.isfile(os.path.join(addon_dir, sub_dir, name)):
+                package.add(os.path.join(sub_dir, name), 'built-in preset')
+            else:
+                preset_missing.append(name)
+
+    details = {
+        'unreachable_shaders': len(unreachable),
+        'dropped_duplicates': dropped,
+        'unbound_channels': unbound,
+        'unused_bindings': unused,
+        'preset_files_missing': preset_missing,
+        'previews_missing': preview_missing,
+    }
+    return addon_id, version, package, details
+
+
+def local_imports(addon_dir, module, seen):
+    # Modules of addon_dir imported, directly or not, by 'module' (a file name)
+    seen.add(module)
+    tree = ast.parse(glsl_source.read_source(os.path.join(addon_dir, module)))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            file_name = name.split('.')[0] + '.py'
+            if file_name not in seen and os.path.isfile(os.path.join(addon_dir, file_name)):
+                local_imports(addon_dir, file_name, seen)
+    return seen
+
+
+def cycler_package(addon_dir):
+    package = Package(addon_dir)
+    addon_id, version, library = add_addon_xml(package)
+    if library and os.path.isfile(os.path.join(addon_dir, library)):
+        for module in sorted(local_imports(addon_dir, library, set())):
+            package.add(module, f'imported by {library}' if module != library else 'addon.xml library')
+    package.add('resources', 'service resources')
+    return addon_id, version, package, {}
+
+
+def sync_tree(package, out_dir):
+    # out_dir becomes exactly the package: changed files replaced, stale ones removed
+    for dir_path, dir_names, file_names in os.walk(out_dir, topdown=False):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if os.path.relpath(path, out_dir) not in package.files:
+                os.remove(path)
+        if dir_path != out_dir and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    for rel_path in sorted(package.files):
+        src, dst = os.path.join(package.addon_dir, rel_path), os.path.join(out_dir, rel_path)
+        if os.path.exists(dst):
+            if os.path.samefile(src, dst):
+                continue
+            os.remove(dst)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def write_zip(package, addon_id, zip_path):
+    # Kodi's install-from-zip layout: one top-level folder named after the addon id
+    tmp_path = zip_path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w') as archive:
+        for rel_path in sorted(package.files):
+            info = zipfile.ZipInfo(f'{addon_id}/{rel_path.replace(os.sep, "/")}', ZIP_DATE)
+            info.external_attr = 0o644 << 16
+            stored = rel_path.lower().endswith(STORED_EXTENSIONS)
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(os.path.join(package.addon_dir, rel_path), 'rb') as f:
+                archive.writestr(info, f.read())
+    os.replace(tmp_path, zip_path)
+
+
+def mb(size):
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Package the screensaver and cycler addons with only referenced files.')
+    parser.add_argument('--out', metavar='DIR', help='sync DIR/<addon id>/ to the package')
+    parser.add_argument('--zip', metavar='DIR', help='write DIR/<addon id>-<version>.zip')
+    parser.add_argument('--all-shaders', action='store_true', help='every selectable shader, not only FIXED_SHADERS')
+    parser.add_argument('--no-presets', dest='presets', action='store_false', help="leave out the .so's built-in preset files")
+    parser.add_argument('--previews', action='store_true', help="include the cycled shaders' Shader-Screens images for the preview overlay")
+    parser.add_argument('--top', type=int, default=15, help='orphaned files to print per addon')
+    parser.add_argument('--json', metavar='PATH', help='write the full report as JSON')
+    args = parser.parse_args(argv)
+
+    builds = [screensaver_package(SCREENSAVER_DIR, args.all_shaders, args.presets, args.previews), cycler_package(CYCLER_DIR)]
+    report, problems = {}, 0
+    for addon_id, version, package, details in builds:
+        orphans = package.orphans()
+        size = package.size()
+        orphan_size = sum(n for _, n in orphans)
+        print(f'{addon_id} {version}: {len(package.files)} files, {mb(size)} '
+              f'({len(orphans)} orphaned files, {mb(orphan_size)}, left out)')
+        for rel_path, n in orphans[:args.top]:
+            print(f'  {mb(n):>9}  {rel_path}')
+        if len(orphans) > args.top:
+            print(f'  ... {len(orphans) - args.top} more')
+        for rel_path, who in sorted(package.missing.items()):
+            print(f'  Missing: {rel_path} ({who})')
+        problems += len(package.missing)
+        if details:
+            print(f"  {details['unreachable_shaders']} shaders never selected, {len(details['dropped_duplicates'])} duplicates dropped")
+            for title, key in (('Sampled but unbound (renders black)', 'unbound_channels'),
+                               ('Bound but never sampled', 'unused_bindings'),
+                               ('Built-in presets without a file', 'preset_files_missing'),
+                               ('Cycled shaders without a preview', 'previews_missing')):
+                if details[key]:
+                    print(f'  {title}: {len(details[key])}')
+                    for line in details[key][:args.top]:
+                        print(f'    {line}')
+                    if len(details[key]) > args.top:
+                        print(f'    ... {len(details[key]) - args.top} more')
+        report[addon_id] = dict(details, version=version, size=size, files=package.files,
+                                missing=package.missing, orphans=orphans)
+
+        if args.out:
+            out_dir = os.path.join(args.out, addon_id)
+            os.makedirs(out_dir, exist_ok=True)
+            sync_tree(package, out_dir)
+            print(f'  Synced {out_dir}')
+        if args.zip:
+            os.makedirs(args.zip, exist_ok=True)
+            zip_path = os.path.join(args.zip, f'{addon_id}-{version}.zip')
+            write_zip(package, addon_id, zip_path)
+            print(f'  Wrote {zip_path} ({mb(os.path.getsize(zip_path))})')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
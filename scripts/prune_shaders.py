@@ -0,0 +1,273 @@
+"""Find duplicate and unreachable shaders and build a pruned deployment set.
+
+Sources are hashed three ways: raw bytes (exact copies), normalized tokens
+with comments and whitespace gone (copies that only differ in formatting or
+comments), and token shingles for near duplicates (Jaccard similarity of
+8-token windows, at least --near). Near duplicates are only reported;
+they are often deliberate variants.
+
+For the screensaver's shader directory the report also lists what the cycler
+can never select: files not named *.frag.glsl, names starting with '-',
+anything in subdirectories (Backup-Superseeded/), EXCLUDED_SHADERS, and, when
+RESTRICT_TO_FIXED_SHADERS is on, everything outside FIXED_SHADERS (both read
+from service.py without importing it). files.txt is compared with what is
+actually on disk.
+
+The deployment set is what the cycler can select, so FIXED_SHADERS alone
+while RESTRICT_TO_FIXED_SHADERS is 1 (--all-shaders: every selectable
+shader, --fixed-only: FIXED_SHADERS whatever the setting), minus
+exact/normalized duplicates (per group the copies named in FIXED_SHADERS
+are kept, else the one in bindings.json or the first by name), plus the
+screensaver's own main_* pipeline shaders. --deploy DIR writes it out,
+hard-linked where possible.
+
+    python scripts/prune_shaders.py
+    python scripts/prune_shaders.py --also "Additional WIP Shaders" --also "Original Shaders/shaders"
+    python scripts/prune_shaders.py --deploy build/shaders
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+import glsl_source
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'service.shadertoy.cycler'))
+
+import hot_reload
+
+DEFAULT_SHADER_DIR = 'screensaver.shadertoy/resources/shaders'
+SERVICE_PATH = 'service.shadertoy.cycler/service.py'
+BINDINGS_PATH = 'service.shadertoy.cycler/resources/bindings.json'
+SHADER_SUFFIX = '.frag.glsl'
+PIPELINE_PREFIX = 'main_' # main_display_*/main_shadertoy_* are screensaver.shadertoy's own shaders
+TOKEN_RE = re.compile(r'[A-Za-z_]\w*|\d*\.?\d+(?:[eE][-+]?\d+)?[uUfF]?|\S')
+SHINGLE = 8
+SKETCH = 64 # Smallest shingle hashes kept per file to find near-duplicate candidates
+
+
+def tokens(source):
+    return TOKEN_RE.findall(glsl_source.strip_comments(source))
+
+
+def shingle_hash(window):
+    # Stable across runs, unlike hash() under PYTHONHASHSEED, so sketches and reports are reproducible
+    return int.from_bytes(hashlib.blake2b(' '.join(window).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class Source:
+    def __init__(self, root, rel_path):
+        self.rel_path = rel_path
+        self.path = os.path.join(root, rel_path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.exact = hashlib.sha1(data).hexdigest()
+        words = tokens(data.decode('utf-8', 'replace'))
+        self.normalized = hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()
+        self.shingles = {shingle_hash(words[i:i + SHINGLE]) for i in range(max(len(words) - SHINGLE + 1, 1))}
+        self.sketch = sorted(self.shingles)[:SKETCH]
+
+
+def walk(root, label):
+    # Every *.glsl below root, as Source objects with paths relative to root
+    sources = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for name in sorted(file_names):
+            if name.endswith('.glsl'):
+                rel_path = os.path.relpath(os.path.join(dir_path, name), root)
+                source = Source(root, rel_path)
+                source.label = os.path.join(label, rel_path)
+                sources.append(source)
+    return sources
+
+
+def service_lists(path):
+    # FIXED_SHADERS, EXCLUDED_SHADERS and RESTRICT_TO_FIXED_SHADERS from service.py, read with
+    # the same ast helper the service uses to reload them
+    values = {'FIXED_SHADERS': [], 'EXCLUDED_SHADERS': [], 'RESTRICT_TO_FIXED_SHADERS': 1}
+    try:
+        values.update(hot_reload.read_constants(path, values))
+    except (OSError, SyntaxError, ValueError):
+        pass
+    return values
+
+
+def bound_shaders(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    return {shader for rule in manifest.get('rules', []) for shader in rule.get('shaders', [])}
+
+
+def groups(sources, key):
+    by_key = collections.defaultdict(list)
+    for source in sources:
+        by_key[getattr(source, key)].append(source)
+    return [group for group in by_key.values() if len(group) > 1]
+
+
+def near_pairs(sources, threshold):
+    # (similarity, a, b) for pairs at or above threshold that are not normalized duplicates.
+    # Candidates share sketch hashes; only those get a full Jaccard comparison.
+    index = collections.defaultdict(list)
+    for i, source in enumerate(sources):
+        for value in source.sketch:
+            index[value].append(i)
+    shared = collections.Counter()
+    for members in index.values():
+        if len(members) > 50:
+            continue # Boilerplate shingle shared by half the library, says nothing
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                shared[members[a], members[b]] += 1
+    pairs = []
+    for (a, b), count in shared.items():
+        first, second = sources[a], sources[b]
+        if count < SKETCH * threshold / 4 or first.normalized == second.normalized:
+            continue
+        similarity = len(first.shingles & second.shingles) / len(first.shingles | second.shingles)
+        if similarity >= threshold:
+            pairs.append((round(similarity, 3), first.label, second.label))
+    return sorted(pairs, reverse=True)
+
+
+def classify(sources, settings):
+    # {rel_path: reason} for files the cycler never selects, and the selectable names
+    fixed = set(settings['FIXED_SHADERS'])
+    excluded = set(settings['EXCLUDED_SHADERS'])
+    unreachable, selectable = {}, []
+    for source in sources:
+        name = source.rel_path
+        if name.startswith(PIPELINE_PREFIX):
+            continue
+        if os.sep in name:
+            unreachable[name] = 'in a subdirectory'
+        elif not name.endswith(SHADER_SUFFIX):
+            unreachable[name] = f'not *{SHADER_SUFFIX}'
+        elif name.startswith('-'):
+            unreachable[name] = "name starts with '-'"
+        elif name in excluded:
+            unreachable[name] = 'in EXCLUDED_SHADERS'
+        else:
+            selectable.append(source)
+            if settings['RESTRICT_TO_FIXED_SHADERS'] == 1 and name not in fixed:
+                unreachable[name] = 'not in FIXED_SHADERS (RESTRICT_TO_FIXED_SHADERS = 1)'
+    return unreachable, selectable
+
+
+def deployment(sources, selectable, settings, bindings, fixed_only):
+    # Names to ship: pipeline shaders plus selectable ones, one per duplicate group
+    fixed = set(settings['FIXED_SHADERS'])
+    wanted = [source for source in selectable if not fixed_only or source.rel_path in fixed]
+    dropped = {}
+    for group in groups(wanted, 'normalized'):
+        # Names in FIXED_SHADERS must stay, the cycler looks them up by name
+        keep = [source for source in group if source.rel_path in fixed]
+        if not keep:
+            keep = sorted(group, key=lambda s: (s.rel_path not in bindings, s.rel_path))[:1]
+        for source in group:
+            if source not in keep:
+                dropped[source.rel_path] = keep[0].rel_path
+    names = [source.rel_path for source in sources if source.rel_path.startswith(PIPELINE_PREFIX) and os.sep not in source.rel_path]
+    names += [source.rel_path for source in wanted if source.rel_path not in dropped]
+    return sorted(names), dropped
+
+
+def files_txt_drift(shader_dir):
+    path = os.path.join(shader_dir, 'files.txt')
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            listed = {line.strip() for line in f if line.strip()}
+    except OSError:
+        return None
+    present = {name for name in os.listdir(shader_dir) if name.endswith('.glsl')}
+    return {'listed_missing': sorted(listed - present), 'unlisted': sorted(present - listed)}
+
+
+def deploy(shader_dir, names, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for name in names:
+        src, dst = os.path.join(shader_dir, name), os.path.join(out_dir, name)
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report duplicate and unreachable shaders and build a pruned set.')
+    parser.add_argument('shader_dir', nargs='?', default=DEFAULT_SHADER_DIR)
+    parser.add_argument('--also', action='append', default=[], metavar='DIR',
+                        help='more trees to check for copies of library shaders (repeatable)')
+    parser.add_argument('--near', type=float, default=0.9, help='Jaccard similarity reported as near duplicate')
+    parser.add_argument('--top', type=int, default=20, help='near-duplicate pairs to print')
+    parser.add_argument('--fixed-only', action='store_true', default=None,
+                        help='deploy only FIXED_SHADERS (plus pipeline shaders), the default while RESTRICT_TO_FIXED_SHADERS is 1')
+    parser.add_argument('--all-shaders', dest='fixed_only', action='store_false',
+                        help='deploy every selectable shader, also while RESTRICT_TO_FIXED_SHADERS is 1')
+    parser.add_argument('--deploy', metavar='DIR', help='write the deployment set to DIR')
+    parser.add_argument('--json', metavar='PATH', help='write the full report as JSON')
+    args = parser.parse_args(argv)
+
+    settings = service_lists(SERVICE_PATH)
+    bindings = bound_shaders(BINDINGS_PATH)
+    library = walk(args.shader_dir, '')
+    others = [source for tree in args.also for source in walk(tree, tree)]
+    everything = library + others
+
+    unreachable, selectable = classify(library, settings)
+    # Same set the cycler can pick from, unless overridden: the report must not ship what it calls never selected
+    fixed_only = settings['RESTRICT_TO_FIXED_SHADERS'] == 1 if args.fixed_only is None else args.fixed_only
+    names, dropped = deployment(library, selectable, settings, bindings, fixed_only)
+    report = {
+        'exact_duplicates': [[s.label for s in group] for group in groups(everything, 'exact')],
+        'normalized_duplicates': [[s.label for s in group] for group in groups(everything, 'normalized')
+                                  if len({s.exact for s in group}) > 1],
+        'near_duplicates': near_pairs(everything, args.near),
+        'unreachable': unreachable,
+        'files_txt': files_txt_drift(args.shader_dir),
+        'deploy': names,
+        'dropped_duplicates': dropped,
+    }
+
+    print(f"{len(library)} files in {args.shader_dir}, {len(others)} in other trees")
+    for title, key in (('Exact duplicates', 'exact_duplicates'), ('Same code, different comments/whitespace', 'normalized_duplicates')):
+        print(f"{title}: {len(report[key])} groups")
+        for group in report[key]:
+            print(f"  {' = '.join(group)}")
+    print(f"Near duplicates (>= {args.near}): {len(report['near_duplicates'])} pairs")
+    for similarity, first, second in report['near_duplicates'][:args.top]:
+        print(f"  {similarity:.2f}  {first}  ~  {second}")
+    reasons = collections.Counter(unreachable.values())
+    print(f"Never selected by the cycler: {len(unreachable)} files")
+    for reason, count in reasons.most_common():
+        print(f"  {count:>4}  {reason}")
+    if report['files_txt'] is not None:
+        drift = report['files_txt']
+        print(f"files.txt: {len(drift['listed_missing'])} listed but missing, {len(drift['unlisted'])} present but unlisted")
+    print(f"Deployment set ({'FIXED_SHADERS' if fixed_only else 'every selectable shader'}): "
+          f"{len(names)} of {len(library)} files, {len(dropped)} duplicates dropped")
+    for name, kept in sorted(dropped.items()):
+        print(f"  {name} (same as {kept})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.deploy:
+        deploy(args.shader_dir, names, args.deploy)
+        print(f"Wrote {len(names)} files to {args.deploy}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
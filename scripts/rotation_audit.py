@@ -0,0 +1,269 @@
+"""Audit shader rotation from kodi.log, replacing the grep/Notepad++ check.
+
+Reads kodi.log files (rotated kodi.old.log first, .gz allowed) line by line
+in one pass. Only the cycler's own lines are decoded; everything else is
+skipped with a byte-substring test, so a few hundred MB take seconds and
+memory depends on the library size, not the log size.
+
+The batch timeline is rebuilt from the "Cycling to X. N shaders remaining
+in current batch." lines: a batch starts where the service logs a reshuffle
+or where the remaining count goes up. The report lists per batch:
+
+  - duplicates: a shader picked more than once in the batch (expected only
+    for FAVORITE_SHADERS weighted above 1, pass those with --favorite)
+  - counter jumps: the remaining count dropped by more than one between
+    consecutive picks (lost log lines, shaders dropped as too slow)
+  - non-monotonic counters: the count stayed put or went up without a new batch
+
+and over the whole log:
+
+  - repeats closer than --min-distance picks, also across batches
+  - stalls: the next pick came much later than --interval while the
+    screensaver stayed up
+  - dwell: how long each shader stayed on screen, until the next pick,
+    a deactivation or a service restart
+
+Eco mode picks ("Eco mode: cycling to X", POWER_POLICY in service.py) come
+from a separate playlist at a longer interval; they only count for dwell.
+
+    python scripts/rotation_audit.py /storage/.kodi/temp/kodi.old.log /storage/.kodi/temp/kodi.log
+    python scripts/rotation_audit.py --json audit.json kodi.log
+"""
+
+import argparse
+import collections
+import datetime
+import gzip
+import json
+import os
+import re
+import sys
+
+DEFAULT_LOGS = ['/storage/.kodi/temp/kodi.old.log', '/storage/.kodi/temp/kodi.log']
+ADDON_MARKER = b'service.shadertoy.cycler: '
+
+# Kodi 19+: "2024-05-01 12:34:56.789 T:1234 info <general>: ...", older builds omit the date
+TIME_RE = re.compile(r'^(?:(\d{4}-\d\d-\d\d) )?(\d\d):(\d\d):(\d\d)(?:\.(\d+))?')
+CYCLE_RE = re.compile(r'Cycling to (.+?)\. (\d+) shaders remaining in current batch')
+ECO_RE = re.compile(r'Eco mode: cycling to (.+)$')
+RESHUFFLE = 'All shaders in current batch cycled'
+STARTED = 'Starting shader cycler service'
+STOPPED = 'Stopping shader cycler service'
+DEACTIVATED = 'Screensaver deactivated'
+
+
+def parse_time(line, last):
+    # Seconds since the epoch (dated lines) or since midnight, carried over day
+    # wraps for undated lines. None when the line has no timestamp.
+    m = TIME_RE.match(line)
+    if not m:
+        return None
+    date, hour, minute, second, fraction = m.groups()
+    seconds = int(hour) * 3600 + int(minute) * 60 + int(second) + (float('0.' + fraction) if fraction else 0)
+    if date:
+        return datetime.datetime.strptime(date, '%Y-%m-%d').timestamp() + seconds
+    if last is not None:
+        while seconds + 43200 < last: # Undated log passed midnight
+            seconds += 86400
+    return seconds
+
+
+def open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb', buffering=1024 * 1024)
+
+
+def cycler_lines(paths):
+    # (path, line number, decoded message after the addon prefix, full line)
+    for path in paths:
+        with open_log(path) as f:
+            for number, raw in enumerate(f, 1):
+                if ADDON_MARKER not in raw:
+                    continue
+                line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                yield path, number, line[line.index(ADDON_MARKER.decode()) + len(ADDON_MARKER):], line
+
+
+class Audit:
+    def __init__(self, interval, stall_factor, min_distance, favorites=()):
+        self.favorites = set(favorites) # Weighted above 1, so allowed more than once per batch
+        self.stall_after = interval * stall_factor
+        self.min_distance = min_distance
+        self.batches = []
+        self.batch = None
+        self.recent = collections.deque(maxlen=max(min_distance, 0)) # Last picks, for spacing
+        self.spacing = [] # (name, distance, where)
+        self.stalls = [] # (seconds, where)
+        self.dwell = {} # name -> [shows, seconds]
+        self.picks = 0
+        self.restarts = 0
+        self.last_time = None
+        self.shown = None # (name, time) currently on screen
+        self.last_pick = None # (remaining, time) of the previous pick in this run of the service
+        self.reshuffle = True # The next pick starts a batch
+
+    def new_batch(self, where, reason):
+        self.batch = {'number': len(self.batches) + 1, 'start': where, 'reason': reason, 'picks': 0,
+                      'first_remaining': None, 'seen': collections.Counter(), 'jumps': [], 'non_monotonic': []}
+        self.batches.append(self.batch)
+
+    def end_show(self, now):
+        if self.shown and now is not None and self.shown[1] is not None:
+            stats = self.dwell.setdefault(self.shown[0], [0, 0.0])
+            stats[0] += 1
+            stats[1] += max(now - self.shown[1], 0)
+        self.shown = None
+
+    def feed(self, path, number, message, line):
+        now = parse_time(line, self.last_time)
+        if now is not None:
+            self.last_time = now
+        where = f'{path}:{number}'
+        if message.startswith(STARTED):
+            self.restarts += 1
+            self.end_show(now)
+            self.last_pick = None
+        elif message.startswith(STOPPED) or message.startswith(DEACTIVATED):
+            self.end_show(now)
+            self.last_pick = None
+        elif message.startswith(RESHUFFLE):
+            self.reshuffle = True
+        else:
+            m = CYCLE_RE.search(message)
+            if m:
+                self.pick(m.group(1), int(m.group(2)), now, where)
+                return
+            m = ECO_RE.search(message)
+            if m:
+                # Eco picks come from their own playlist and interval: count dwell, but do not
+                # judge the main batch's counter or the gap to the next regular pick against them
+                self.end_show(now)
+                self.shown = (m.group(1).strip(), now)
+                self.last_pick = None
+
+    def pick(self, name, remaining, now, where):
+        self.picks += 1
+        previous = self.last_pick
+        if self.reshuffle or self.batch is None:
+            self.new_batch(where, 'reshuffle' if self.batch else 'start of log')
+        elif previous and remaining >= previous[0]:
+            # A restart resumes the same batch, so only a running service's count is judged
+            self.batch['non_monotonic'].append((previous[0], remaining, where))
+            if remaining > previous[0]:
+                self.new_batch(where, 'count went up')
+        elif previous and remaining < previous[0] - 1:
+            self.batch['jumps'].append((previous[0], remaining, where))
+        self.reshuffle = False
+        batch = self.batch
+        batch['picks'] += 1
+        if batch['first_remaining'] is None:
+            batch['first_remaining'] = remaining
+        batch['seen'][name] += 1
+        if name in self.recent:
+            distance = len(self.recent) - max(i for i, recent in enumerate(self.recent) if recent == name)
+            # The playlist caps the distance at half the library, the batch size stands in for that here
+            if distance <= min(self.min_distance, (batch['first_remaining'] + 1) // 2):
+                self.spacing.append((name, distance, where))
+        self.recent.append(name)
+        if previous and now is not None and previous[1] is not None and now - previous[1] > self.stall_after:
+            self.stalls.append((now - previous[1], where))
+        self.end_show(now)
+        self.shown = (name, now)
+        self.last_pick = (remaining, now)
+
+    def report(self):
+        batches = []
+        for batch in self.batches:
+            batches.append({
+                'number': batch['number'],
+                'start': batch['start'],
+                'reason': batch['reason'],
+                'picks': batch['picks'],
+                'size': batch['first_remaining'] + 1, # As seen at the batch's first logged pick
+                'unique': len(batch['seen']),
+                'duplicates': {name: n for name, n in sorted(batch['seen'].items())
+                               if n > 1 and name not in self.favorites},
+                'counter_jumps': batch['jumps'],
+                'non_monotonic': batch['non_monotonic'],
+            })
+        return {
+            'picks': self.picks,
+            'restarts': self.restarts,
+            'batches': batches,
+            'spacing_violations': self.spacing,
+            'stalls': [(round(seconds), where) for seconds, where in self.stalls],
+            'dwell': {name: {'shows': shows, 'seconds': round(seconds), 'mean': round(seconds / shows, 1)}
+                      for name, (shows, seconds) in sorted(self.dwell.items())},
+        }
+
+
+def print_report(report, top):
+    print(f"{report['picks']} picks in {len(report['batches'])} batches, {report['restarts']} service starts")
+    for batch in report['batches']:
+        problems = []
+        if batch['duplicates']:
+            problems.append(f"{len(batch['duplicates'])} duplicated")
+        if batch['counter_jumps']:
+            problems.append(f"{len(batch['counter_jumps'])} counter jumps")
+        if batch['non_monotonic']:
+            problems.append(f"{len(batch['non_monotonic'])} non-monotonic")
+        print(f"  batch {batch['number']:>3}: {batch['picks']:>4} picks, {batch['unique']:>4} unique of ~{batch['size']}"
+              f" ({batch['reason']}, {batch['start']}){': ' + ', '.join(problems) if problems else ''}")
+        for name, n in batch['duplicates'].items():
+            print(f"      duplicate {name} x{n}")
+        for before, after, where in batch['counter_jumps']:
+            print(f"      remaining {before} -> {after} at {where}")
+        for before, after, where in batch['non_monotonic']:
+            print(f"      remaining {before} -> {after} at {where}")
+    if report['spacing_violations']:
+        print(f"{len(report['spacing_violations'])} repeats closer than the minimum distance:")
+        for name, distance, where in report['spacing_violations'][:top]:
+            print(f"  {name} again after {distance} picks at {where}")
+    if report['stalls']:
+        print(f"{len(report['stalls'])} stalls:")
+        for seconds, where in report['stalls'][:top]:
+            print(f"  {seconds} s before the pick at {where}")
+    dwell = sorted(report['dwell'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+    if dwell:
+        print(f"Longest total dwell (of {len(dwell)} shaders):")
+        for name, stats in dwell[:top]:
+            print(f"  {stats['seconds']:>7} s  {stats['shows']:>4} shows  {stats['mean']:>6} s mean  {name}")
+    clean = not report['spacing_violations'] and not any(
+        batch['duplicates'] or batch['counter_jumps'] or batch['non_monotonic'] for batch in report['batches'])
+    print('No rotation problems found' if clean else 'Rotation problems found')
+    return clean
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit the shader cycler's rotation from kodi.log.")
+    parser.add_argument('logs', nargs='*', default=DEFAULT_LOGS, help='log files, oldest first (default: kodi.old.log kodi.log)')
+    parser.add_argument('--interval', type=float, default=60, help="the cycler's CYCLE_INTERVAL in seconds")
+    parser.add_argument('--stall-factor', type=float, default=2, help='report picks more than this many intervals apart')
+    parser.add_argument('--min-distance', type=int, default=100, help="the cycler's MIN_REPEAT_DISTANCE")
+    parser.add_argument('--favorite', action='append', default=[], metavar='NAME',
+                        help='a FAVORITE_SHADERS entry weighted above 1, not reported as duplicate (repeatable)')
+    parser.add_argument('--top', type=int, default=20, help='lines to print per list')
+    parser.add_argument('--json', metavar='PATH', help="also write the full report as JSON, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    logs = args.logs
+    if logs == DEFAULT_LOGS:
+        logs = [path for path in logs if os.path.exists(path)] # kodi.old.log only exists after a restart
+    audit = Audit(args.interval, args.stall_factor, args.min_distance, args.favorite)
+    for path, number, message, line in cycler_lines(logs):
+        audit.feed(path, number, message, line)
+    audit.end_show(audit.last_time)
+    report = audit.report()
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+        return 0
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    return 0 if print_report(report, args.top) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
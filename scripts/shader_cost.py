@@ -0,0 +1,283 @@
+"""Rank the shader library by estimated per-pixel cost, without a GPU.
+
+Each *.frag.glsl is read as text: comments are stripped, #defines and const
+scalars are collected, functions are split out and a cost is estimated from
+mainImage downwards. Statements count 1, texture fetches count
+TEXTURE_WEIGHT, calls add the callee's cost and loops multiply their body by
+the iteration count resolved from the loop header (falling back to a default
+bound when it is not a compile-time constant). #if branches are all counted,
+so the estimate errs on the heavy side.
+
+The JSON report (default: the cycler's resources/shader_cost.json) lists
+each shader with its cost and a low/medium/high tier that the cycler reads.
+
+    python scripts/shader_cost.py
+    python scripts/shader_cost.py --top 25 some/dir -o report.json
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+
+import glsl_source
+
+DEFAULT_SHADER_DIR = 'screensaver.shadertoy/resources/shaders'
+DEFAULT_REPORT = 'service.shadertoy.cycler/resources/shader_cost.json'
+REPORT_VERSION = 1
+
+TEXTURE_WEIGHT = 8 # A fetch costs roughly this many ALU statements on low-end iGPUs
+DEFAULT_FOR_BOUND = 16 # Iterations assumed when a for loop's bound is not constant
+DEFAULT_WHILE_BOUND = 32
+MAX_ITERATIONS = 100000
+# Tier thresholds on the estimated cost, tuned so most of the hand-picked "better specced PC"
+# raymarchers (00fractal1/3, bubblehell, windyplanes, papercity) land in 'high'
+MEDIUM_COST = 2000
+HIGH_COST = 12000
+
+KEYWORDS = {'if', 'else', 'for', 'while', 'do', 'return', 'switch', 'case', 'break', 'continue', 'discard'}
+FUNCTION_RE = re.compile(r'\b([A-Za-z_]\w*)\s+([A-Za-z_]\w*)\s*\(([^()]*)\)\s*\{')
+LOOP_RE = re.compile(r'\b(for|while)\s*\(')
+COMPOUND_RE = re.compile(r'(for|while|if)\s*\(')
+ELSE_RE = re.compile(r'\s*else\b')
+CALL_RE = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+TEXTURE_RE = re.compile(r'\b(?:texture|texture2D|textureLod|texture2DLod|texelFetch|textureGrad|textureProj)\s*\(')
+LITERAL_VAR_RE = re.compile(r'\b(?:int|float|uint)\s+([A-Za-z_]\w*)\s*=\s*([-+]?[\d.]+[fFuU]?)\s*;')
+INTERESTING_DEFINE_RE = re.compile(r'AA|STEP|ITER|MAX|SAMPLE|OCTAVE|LOOP|BOUNCE|RAY', re.IGNORECASE)
+
+
+def split_functions(code):
+    # {name: body} for every function definition in comment-free code
+    functions = {}
+    for m in FUNCTION_RE.finditer(code):
+        return_type, name = m.group(1), m.group(2)
+        if return_type in KEYWORDS or name in KEYWORDS:
+            continue
+        open_brace = m.end() - 1
+        functions[name] = code[open_brace + 1:glsl_source.find_matching(code, open_brace)]
+    return functions
+
+
+def loop_iterations(kind, header, symbols):
+    # (iterations, resolved) for a loop header such as 'int i = 0; i < STEPS; i++'
+    if kind == 'while':
+        return DEFAULT_WHILE_BOUND, False
+    parts = header.split(';')
+    if len(parts) != 3:
+        return DEFAULT_FOR_BOUND, False
+    init, cond, step = (part.strip() for part in parts)
+    m = re.match(r'(?:\w+\s+)?([A-Za-z_]\w*)\s*=\s*(.+)$', init)
+    if not m:
+        return DEFAULT_FOR_BOUND, False
+    var, start = m.group(1), glsl_source.eval_number(m.group(2), symbols)
+    cond = re.split(r'&&|\|\|', cond)[0].strip()
+    m = re.match(r'%s\s*(<=|<|>=|>|!=)\s*(.+)$' % re.escape(var), cond)
+    if m:
+        op, end = m.group(1), glsl_source.eval_number(m.group(2), symbols)
+    else:
+        m = re.match(r'(.+?)\s*(<=|<|>=|>)\s*%s$' % re.escape(var), cond)
+        if not m:
+            return DEFAULT_FOR_BOUND, False
+        op = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}[m.group(2)]
+        end = glsl_source.eval_number(m.group(1), symbols)
+    step_value, geometric = None, False
+    if re.fullmatch(r'(?:%s\s*\+\+|\+\+\s*%s)' % (re.escape(var), re.escape(var)), step):
+        step_value = 1
+    elif re.fullmatch(r'(?:%s\s*--|--\s*%s)' % (re.escape(var), re.escape(var)), step):
+        step_value = -1
+    else:
+        m = re.fullmatch(r'%s\s*([-+*/])=\s*(.+)' % re.escape(var), step) or \
+            re.fullmatch(r'%s\s*=\s*%s\s*([-+*/])\s*(.+)' % (re.escape(var), re.escape(var)), step)
+        if m:
+            amount = glsl_source.eval_number(m.group(2), symbols)
+            if amount is not None:
+                if m.group(1) in '+-':
+                    step_value = amount if m.group(1) == '+' else -amount
+                else:
+                    geometric = True
+                    step_value = amount if m.group(1) == '*' else (1.0 / amount if amount else None)
+    if start is None or end is None or not step_value:
+        return DEFAULT_FOR_BOUND, False
+    try:
+        if geometric:
+            if start <= 0 or end <= 0 or step_value <= 0 or step_value == 1:
+                return DEFAULT_FOR_BOUND, False
+            count = math.log(end / start) / math.log(step_value)
+        else:
+            count = (end - start) / step_value
+    except (ValueError, ZeroDivisionError):
+        return DEFAULT_FOR_BOUND, False
+    if op in ('<=', '>=') and count == int(count):
+        count += 1
+    return max(0, min(MAX_ITERATIONS, int(math.ceil(count)))), True
+
+
+def statement_end(text, start):
+    # Index of the last character of the statement starting at text[start]: a braced
+    # block, a loop or if with its body (e.g. 'for (m) for (n) { ... }'), or up to ';'
+    j = start
+    while j < len(text) and text[j].isspace():
+        j += 1
+    if j >= len(text):
+        return len(text)
+    if text[j] == '{':
+        return glsl_source.find_matching(text, j)
+    m = COMPOUND_RE.match(text, j)
+    if m:
+        end = statement_end(text, glsl_source.find_matching(text, m.end() - 1, '(', ')') + 1)
+        if m.group(1) == 'if':
+            m = ELSE_RE.match(text, end + 1)
+            if m:
+                end = statement_end(text, m.end())
+        return end
+    end = text.find(';', j)
+    return len(text) if end == -1 else end
+
+
+class Estimator:
+    def __init__(self, code):
+        self.code = code
+        self.symbols = glsl_source.symbols(code)
+        for name, value in LITERAL_VAR_RE.findall(code):
+            self.symbols.setdefault(name, value)
+        self.functions = split_functions(code)
+        self.memo = {}
+        self.unresolved = 0
+
+    def function(self, name):
+        # (cost, texture fetches, loop depth) of one function, callees included
+        if name not in self.memo:
+            self.memo[name] = (0, 0, 0) # GLSL has no recursion, this only guards odd sources
+            self.memo[name] = self.block(self.functions[name])
+        return self.memo[name]
+
+    def flat(self, segment):
+        # Loop-free code: statements, fetches and calls to user functions
+        cost = segment.count(';')
+        fetches = len(TEXTURE_RE.findall(segment))
+        cost += fetches * TEXTURE_WEIGHT
+        depth = 0
+        for name in CALL_RE.findall(segment):
+            if name in self.functions:
+                callee_cost, callee_fetches, callee_depth = self.function(name)
+                cost += callee_cost
+                fetches += callee_fetches
+                depth = max(depth, callee_depth)
+        return cost, fetches, depth
+
+    def block(self, text):
+        cost = fetches = depth = 0
+        i = 0
+        while True:
+            m = LOOP_RE.search(text, i)
+            seg_cost, seg_fetches, seg_depth = self.flat(text[i:m.start() if m else len(text)])
+            cost += seg_cost
+            fetches += seg_fetches
+            depth = max(depth, seg_depth)
+            if not m:
+                return cost, fetches, depth
+            close_paren = glsl_source.find_matching(text, m.end() - 1, '(', ')')
+            header = text[m.end():close_paren]
+            body_end = statement_end(text, close_paren + 1)
+            body = text[close_paren + 1:body_end + 1]
+            iterations, resolved = loop_iterations(m.group(1), header, self.symbols)
+            if not resolved:
+                self.unresolved += 1
+            body_cost, body_fetches, body_depth = self.block(body)
+            cost += iterations * (body_cost + 1)
+            fetches += iterations * body_fetches
+            depth = max(depth, body_depth + 1)
+            i = body_end + 1
+
+    def reachable(self, entry):
+        seen = set()
+        stack = [entry]
+        while stack:
+            name = stack.pop()
+            if name in seen or name not in self.functions:
+                continue
+            seen.add(name)
+            stack.extend(CALL_RE.findall(self.functions[name]))
+        return seen
+
+
+def tier(cost, medium=MEDIUM_COST, high=HIGH_COST):
+    return 'high' if cost >= high else 'medium' if cost >= medium else 'low'
+
+
+def analyse(source, medium=MEDIUM_COST, high=HIGH_COST):
+    code = glsl_source.strip_comments(source)
+    estimator = Estimator(code)
+    entry = 'mainImage' if 'mainImage' in estimator.functions else 'main'
+    if entry not in estimator.functions:
+        return None
+    cost, fetches, depth = estimator.function(entry)
+    defines = {}
+    for name, value in estimator.symbols.items():
+        if INTERESTING_DEFINE_RE.search(name):
+            number = glsl_source.eval_number(value, estimator.symbols)
+            if number is not None:
+                defines[name] = number
+    return {
+        'cost': int(cost),
+        'tier': tier(cost, medium, high),
+        'loop_depth': depth,
+        'texture_fetches': len(TEXTURE_RE.findall(code)),
+        'fetches_per_pixel': int(fetches),
+        'functions': len(estimator.reachable(entry)),
+        'unresolved_loops': estimator.unresolved,
+        'defines': defines,
+    }
+
+
+def build_report(shader_dir, medium=MEDIUM_COST, high=HIGH_COST):
+    shaders = {}
+    skipped = []
+    for name in sorted(os.listdir(shader_dir)):
+        if not name.endswith('.frag.glsl'):
+            continue
+        result = analyse(glsl_source.read_source(os.path.join(shader_dir, name)), medium, high)
+        if result is None:
+            skipped.append(name)
+        else:
+            shaders[name] = result
+    return {
+        'version': REPORT_VERSION,
+        'thresholds': {'medium': medium, 'high': high},
+        'shaders': shaders,
+        'skipped': skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate per-pixel cost of Shadertoy GLSL shaders.')
+    parser.add_argument('shader_dir', nargs='?', default=DEFAULT_SHADER_DIR)
+    parser.add_argument('-o', '--output', default=DEFAULT_REPORT, help="report path, '-' for stdout")
+    parser.add_argument('--top', type=int, default=20, help='print the N most expensive shaders')
+    parser.add_argument('--medium', type=int, default=MEDIUM_COST, help='cost at which a shader becomes medium tier')
+    parser.add_argument('--high', type=int, default=HIGH_COST, help='cost at which a shader becomes high tier')
+    args = parser.parse_args(argv)
+
+    report = build_report(args.shader_dir, args.medium, args.high)
+    text = json.dumps(report, indent=1, sort_keys=True) + '\n'
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        ranked = sorted(report['shaders'].items(), key=lambda item: item[1]['cost'], reverse=True)
+        counts = {name: 0 for name in ('low', 'medium', 'high')}
+        for name, result in ranked:
+            counts[result['tier']] += 1
+        print(f"{len(ranked)} shaders: {counts['low']} low, {counts['medium']} medium, {counts['high']} high -> {args.output}")
+        for name, result in ranked[:args.top]:
+            print(f"{result['cost']:>10}  {result['tier']:<6}  depth {result['loop_depth']}  fetches {result['texture_fetches']:>3}  {name}")
+        if report['skipped']:
+            print(f"No mainImage/main in: {', '.join(report['skipped'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import json
+import os
+
+
+def write_bytes(path, data):
+    # Write to a temp file next to 'path' and rename it over the original,
+    # so readers see either the old or the new file, never a partial one.
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data):
+    write_bytes(path, json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+
+def read_json(path, default=None):
+    # Missing or unreadable files (e.g. first run, truncated by a crash) give 'default'
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
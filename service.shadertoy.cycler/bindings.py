@@ -0,0 +1,56 @@
+import json
+import os
+
+# Texture slots of screensaver.shadertoy, in iChannel order
+CHANNELS = ('texture0', 'texture1', 'texture2', 'texture3')
+# Binding used for shaders that have no rule: every channel cleared
+EMPTY_BINDING = {channel: '' for channel in CHANNELS}
+
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compile_bindings(manifest, texture_dir, available):
+    # Turn the rule list from bindings.json into {shader: {channel: texture path}}.
+    # 'available' is the set of file names in texture_dir (one directory listing),
+    # so fallback chains are resolved here once instead of probing on every switch.
+    # Returns (table, problems) where problems is a list of messages worth logging.
+    table = {}
+    bound = {}  # shader -> channels already set by an earlier rule
+    problems = []
+    for rule in manifest.get('rules', []):
+        for channel in CHANNELS:
+            if channel not in rule:
+                continue
+            chain = rule[channel]
+            if isinstance(chain, str):
+                chain = [chain]
+            found = next((name for name in chain if name in available), None)
+            if found is None:
+                problems.append(f"No texture of {chain} found for {channel} of {', '.join(rule['shaders'])}")
+            elif found != chain[0]:
+                problems.append(f"Texture {chain[0]} not found, falling back to {found} for {channel} of {', '.join(rule['shaders'])}")
+            texture_path = os.path.join(texture_dir, found) if found else ''
+            for shader in rule['shaders']:
+                # First rule that binds a channel wins, like the old if/elif chain
+                if channel in bound.setdefault(shader, set()):
+                    continue
+                bound[shader].add(channel)
+                table.setdefault(shader, dict(EMPTY_BINDING))[channel] = texture_path
+    return table, problems
+
+
+def lookup(table, shader):
+    return table.get(shader, EMPTY_BINDING)
+
+
+def texture_paths(table):
+    return {path for binding in table.values() for path in binding.values() if path}
+
+
+def remap(table, replacements):
+    # Copy of table with texture paths swapped for replacements (e.g. downscaled variants)
+    return {shader: {channel: replacements.get(path, path) for channel, path in binding.items()}
+            for shader, binding in table.items()}
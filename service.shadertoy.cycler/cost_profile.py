@@ -0,0 +1,36 @@
+import atomicfile
+
+
+class CostTable:
+    # Per-host render statistics for each shader, built from FPS samples taken
+    # while the shader is on screen. Kept as running totals (count, sum, min) so
+    # the file stays small however long the box has been profiling.
+    def __init__(self, path):
+        self.path = path
+        self.shaders = atomicfile.read_json(path, {}).get('shaders', {})
+        self.dirty = False
+
+    def record(self, shader, fps):
+        entry = self.shaders.setdefault(shader, {'n': 0, 'sum': 0.0, 'min': fps})
+        entry['n'] += 1
+        entry['sum'] += fps
+        entry['min'] = min(entry['min'], fps)
+        self.dirty = True
+
+    def stats(self, shader):
+        # (samples, mean fps, min fps, mean frame time in ms) or None if never sampled
+        entry = self.shaders.get(shader)
+        if not entry or not entry['n']:
+            return None
+        mean = entry['sum'] / entry['n']
+        return entry['n'], mean, entry['min'], 1000.0 / mean if mean else float('inf')
+
+    def too_slow(self, shader, fps_floor, min_samples):
+        # Only judge shaders with enough samples, a single stutter should not drop one
+        stats = self.stats(shader)
+        return bool(fps_floor) and stats is not None and stats[0] >= min_samples and stats[1] < fps_floor
+
+    def save(self):
+        if self.dirty:
+            atomicfile.write_json(self.path, {'shaders': self.shaders})
+            self.dirty = False
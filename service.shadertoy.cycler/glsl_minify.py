@@ -0,0 +1,372 @@
+import hashlib
+import os
+import re
+import sys
+
+import atomicfile
+
+MINIFY_VERSION = 3 # Bump when the output changes, so cached copies are rebuilt
+INCLUDE_DIRS = ('', 'include') # Searched, relative to the shader directory, for #include "file"
+MAX_INCLUDE_DEPTH = 8
+# Defined by screensaver.shadertoy's fragment header or the GL compiler, so never
+# decidable here. GL_* and __* names are treated the same way.
+EXTERNAL_MACROS = {'iTime', 'texture', 'textureLod', 'GL_ES'}
+
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+DIRECTIVE_RE = re.compile(r'^\s*#\s*(\w+)\s*(.*)$')
+INCLUDE_RE = re.compile(r'^"([^"]+)"|^<([^>]+)>')
+DEFINE_RE = re.compile(r'^([A-Za-z_]\w*)(\([^)]*\))?\s*(.*)$')
+DEFINED_RE = re.compile(r'\bdefined\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))')
+IDENT_RE = re.compile(r'\b[A-Za-z_]\w*\b')
+TOKEN_RE = re.compile(r'\s*(?:(0[xX][0-9a-fA-F]+|\d+)[uUlL]*\b|(&&|\|\||<<|>>|<=|>=|==|!=|[-+*/%()<>!~&|^?:]))')
+# Binary operators of #if by precedence, as in C; all are left-associative
+BINARY = {'||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6, '<': 7, '>': 7, '<=': 7, '>=': 7,
+          '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10}
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1 # intmax_t, what the preprocessor computes in
+UNKNOWN = object() # Value of a macro whose definition depends on an undecidable branch
+FUNCTION = object() # Value of a function-like macro
+
+
+class MinifyError(Exception):
+    pass
+
+
+def _external(name):
+    return name in EXTERNAL_MACROS or name.startswith('GL_') or name.startswith('__')
+
+
+def _tokens(expr):
+    tokens, pos = [], 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = TOKEN_RE.match(expr, pos)
+        if not m:
+            raise ValueError(f'unexpected {expr[pos:]!r}')
+        number = m.group(1)
+        if number is None:
+            tokens.append(m.group(2))
+        elif number[:2] in ('0x', '0X'):
+            tokens.append(int(number, 16))
+        else:
+            tokens.append(int(number, 8 if number.startswith('0') else 10))
+        pos = m.end()
+    return tokens
+
+
+def _apply(op, a, b):
+    if op in ('/', '%'):
+        if not b:
+            raise ZeroDivisionError(op)
+        q = abs(a) // abs(b) * (1 if (a < 0) == (b < 0) else -1) # C truncates towards zero
+        value = q if op == '/' else a - b * q
+    elif op in ('<<', '>>'):
+        if b < 0 or b >= 64:
+            raise ValueError(f'shift by {b}')
+        value = a << b if op == '<<' else a >> b
+    else:
+        value = {
+            '||': lambda: int(bool(a or b)), '&&': lambda: int(bool(a and b)),
+            '|': lambda: a | b, '^': lambda: a ^ b, '&': lambda: a & b,
+            '==': lambda: int(a == b), '!=': lambda: int(a != b),
+            '<': lambda: int(a < b), '>': lambda: int(a > b), '<=': lambda: int(a <= b), '>=': lambda: int(a >= b),
+            '+': lambda: a + b, '-': lambda: a - b, '*': lambda: a * b,
+        }[op]()
+    if not INT_MIN <= value <= INT_MAX:
+        raise ValueError('overflow') # Wraps in C, not worth modelling
+    return value
+
+
+def evaluate(expr):
+    # Integer value of a #if expression left with only literals and operators, by C rules:
+    # integer '/', left-associative comparisons, C precedence for '!' and the rest.
+    # Raises ValueError (or ZeroDivisionError) when it cannot be evaluated.
+    tokens = _tokens(expr)
+    pos = 0
+
+    def take():
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError('unexpected end')
+        pos += 1
+        return tokens[pos - 1]
+
+    def unary():
+        token = take()
+        if token == '(':
+            value = conditional()
+            if pos >= len(tokens) or take() != ')':
+                raise ValueError('missing )')
+            return value
+        if token in ('!', '~', '-', '+'):
+            value = unary()
+            return {'!': int(not value), '~': ~value, '-': -value, '+': value}[token]
+        if isinstance(token, int):
+            return token
+        raise ValueError(f'unexpected {token}')
+
+    def binary(level):
+        left = unary()
+        while pos < len(tokens) and BINARY.get(tokens[pos], 0) >= level:
+            op = take()
+            left = _apply(op, left, binary(BINARY[op] + 1))
+        return left
+
+    def conditional():
+        value = binary(1)
+        if pos < len(tokens) and tokens[pos] == '?':
+            take()
+            then = conditional()
+            if take() != ':':
+                raise ValueError('missing :')
+            otherwise = conditional()
+            return then if value else otherwise
+        return value
+
+    value = conditional()
+    if pos != len(tokens):
+        raise ValueError(f'unexpected {tokens[pos]}')
+    return value
+
+
+class _Preprocessor:
+    # Drops comments, blank lines, surplus whitespace and #if/#ifdef branches that
+    # are decidable from the file's own #defines. Branches that depend on macros
+    # from outside the file (GL_ES, the screensaver header) are kept untouched.
+    def __init__(self, shader_dir):
+        self.shader_dir = shader_dir
+        self.macros = {}
+        self.includes = [] # Files pulled in through #include
+        self.out = []
+        self.stack = [] # One entry per open #if: 'take', 'skip', 'done' or 'keep'
+
+    def emitting(self):
+        return all(state in ('take', 'keep') for state in self.stack)
+
+    def uncertain(self):
+        return 'keep' in self.stack
+
+    def defined(self, name):
+        if _external(name):
+            return None
+        value = self.macros.get(name)
+        if value is UNKNOWN:
+            return None
+        return value is not None
+
+    def condition(self, kind, expr):
+        # True/False if decidable from this file, None otherwise
+        expr = expr.strip()
+        if kind == 'ifdef':
+            return self.defined(expr)
+        if kind == 'ifndef':
+            result = self.defined(expr)
+            return None if result is None else not result
+        undecidable = []
+
+        def replace_defined(m):
+            result = self.defined(m.group(1) or m.group(2))
+            if result is None:
+                undecidable.append(m.group(0))
+            return '1' if result else '0'
+
+        expr = DEFINED_RE.sub(replace_defined, expr)
+        for _ in range(MAX_INCLUDE_DEPTH):
+            names = set(IDENT_RE.findall(expr))
+            if not names:
+                break
+            for name in names:
+                value = self.macros.get(name)
+                if _external(name) or value is UNKNOWN or value is FUNCTION:
+                    return None
+                expr = re.sub(r'\b%s\b' % name, '(%s)' % (value if value else '0'), expr)
+        if undecidable or IDENT_RE.search(expr):
+            return None
+        try:
+            return bool(evaluate(expr)) # Only numbers and operators are left
+        except (ValueError, ZeroDivisionError):
+            return None
+
+    def directive(self, name, rest, line, depth):
+        if name in ('if', 'ifdef', 'ifndef'):
+            if not self.emitting():
+                self.stack.append('done')
+                return
+            result = self.condition(name, rest)
+            if result is None:
+                self.stack.append('keep')
+                self.out.append(line)
+            else:
+                self.stack.append('take' if result else 'skip')
+        elif name in ('elif', 'else'):
+            if not self.stack:
+                raise MinifyError(f'#{name} without #if')
+            state = self.stack.pop()
+            if state == 'keep':
+                self.stack.append('keep')
+                if self.emitting():
+                    self.out.append(line)
+            elif state in ('take', 'done'):
+                self.stack.append('done')
+            else: # 'skip'
+                if not self.emitting():
+                    self.stack.append('done')
+                    return
+                result = True if name == 'else' else self.condition('if', rest)
+                if result is None:
+                    # Undecidable #elif after decided-false branches: keep it as a plain #if
+                    self.stack.append('keep')
+                    self.out.append('#if ' + rest)
+                else:
+                    self.stack.append('take' if result else 'skip')
+        elif name == 'endif':
+            if not self.stack:
+                raise MinifyError('#endif without #if')
+            if self.stack.pop() == 'keep' and self.emitting():
+                self.out.append(line)
+        elif not self.emitting():
+            return
+        elif name == 'include':
+            m = INCLUDE_RE.match(rest.strip())
+            if not m:
+                raise MinifyError(f'bad #include {rest.strip()}')
+            self.include(m.group(1) or m.group(2), depth)
+        elif name == 'define':
+            m = DEFINE_RE.match(rest)
+            if m:
+                # Function-like macros count for defined() but are never expanded in a condition
+                value = m.group(3).strip()
+                if self.uncertain() or m.group(2):
+                    value = UNKNOWN if self.uncertain() else FUNCTION
+                self.macros[m.group(1)] = value
+            self.out.append(line)
+        elif name == 'undef':
+            self.macros[rest.strip()] = UNKNOWN if self.uncertain() else None
+            self.out.append(line)
+        else:
+            self.out.append(line)
+
+    def include(self, name, depth):
+        if depth >= MAX_INCLUDE_DEPTH:
+            raise MinifyError(f'#include nested too deep at {name}')
+        for sub_dir in INCLUDE_DIRS:
+            path = os.path.join(self.shader_dir, sub_dir, name)
+            if os.path.isfile(path):
+                self.includes.append(path)
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    self.feed(f.read(), depth + 1)
+                return
+        raise MinifyError(f'#include "{name}" not found')
+
+    def feed(self, source, depth=0):
+        code = COMMENT_RE.sub(lambda m: '\n' * m.group(0).count('\n') or ' ', source)
+        code = re.sub(r'\\\r?\n', ' ', code) # Join macro continuation lines
+        for raw in code.splitlines():
+            line = ' '.join(raw.split())
+            if not line:
+                continue
+            m = DIRECTIVE_RE.match(line)
+            if m:
+                self.directive(m.group(1), m.group(2), '#' + m.group(1) + (' ' + m.group(2) if m.group(2) else ''), depth)
+            elif self.emitting():
+                self.out.append(line)
+
+
+def minify(source, shader_dir='.'):
+    # (minified source, list of included files)
+    pre = _Preprocessor(shader_dir)
+    pre.feed(source)
+    if pre.stack:
+        raise MinifyError('unterminated #if')
+    return '\n'.join(pre.out) + '\n', pre.includes
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def build_cache(shader_dir, entries, cache_dir):
+    # Minified copies of the shaders in 'entries' ({name: {'hash': ...}}, as kept by
+    # shader_index) in cache_dir, keyed by source hash. manifest.json also keeps the
+    # size and mtime of the shader and its #include files as they were when each copy
+    # was built; a copy is reused only while all of them still match, so an edit is
+    # picked up even if the hash passed in is stale. Unchanged shaders cost one stat
+    # per file and no reads. Returns ({name: cached path}, {name: error}).
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    manifest = atomicfile.read_json(manifest_path, {})
+    if manifest.get('version') != MINIFY_VERSION:
+        manifest = {'version': MINIFY_VERSION, 'shaders': {}}
+    built, errors, dirty = {}, {}, False
+    for name, entry in entries.items():
+        record = manifest['shaders'].get(name)
+        source_path = os.path.join(shader_dir, name)
+        if record and record['hash'] == entry['hash']:
+            path = os.path.join(cache_dir, record['file'])
+            try:
+                stamps = dict(record['includes'], **{source_path: record['source']})
+                if all(_stamp(file_path) == stamp for file_path, stamp in stamps.items()) and os.path.exists(path):
+                    built[name] = path
+                    continue
+            except OSError:
+                pass
+        try:
+            stamp = _stamp(source_path) # Before reading, so a save during the build makes the next one redo it
+            with open(source_path, 'r', encoding='utf-8', errors='replace') as f:
+                source = f.read()
+            code, includes = minify(source, shader_dir)
+        except (OSError, MinifyError) as e:
+            errors[name] = str(e)
+            manifest['shaders'].pop(name, None)
+            dirty = True
+            continue
+        file_name = f"{hashlib.sha1((source + code).encode('utf-8')).hexdigest()[:16]}.frag.glsl"
+        atomicfile.write_bytes(os.path.join(cache_dir, file_name), code.encode('utf-8'))
+        manifest['shaders'][name] = {'hash': entry['hash'], 'source': stamp, 'file': file_name,
+                                     'includes': {include: _stamp(include) for include in includes}}
+        built[name] = os.path.join(cache_dir, file_name)
+        dirty = True
+    # Forget shaders that left the library and delete copies nobody points at
+    for name in set(manifest['shaders']) - set(entries):
+        del manifest['shaders'][name]
+        dirty = True
+    if dirty:
+        atomicfile.write_json(manifest_path, manifest)
+        keep = {record['file'] for record in manifest['shaders'].values()} | {'manifest.json'}
+        for file_name in os.listdir(cache_dir):
+            if file_name not in keep:
+                try:
+                    os.remove(os.path.join(cache_dir, file_name))
+                except OSError:
+                    pass
+    return built, errors
+
+
+def main(argv):
+    # Build step: python glsl_minify.py <shader_dir> <out_dir> minifies every *.frag.glsl
+    if len(argv) != 2:
+        print('usage: glsl_minify.py <shader_dir> <out_dir>')
+        return 2
+    shader_dir, out_dir = argv
+    os.makedirs(out_dir, exist_ok=True)
+    before = after = 0
+    for name in sorted(os.listdir(shader_dir)):
+        if not name.endswith('.frag.glsl'):
+            continue
+        with open(os.path.join(shader_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+            source = f.read()
+        try:
+            code, includes = minify(source, shader_dir)
+        except MinifyError as e:
+            print(f'{name}: {e}')
+            continue
+        with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+            f.write(code)
+        before += len(source.encode('utf-8'))
+        after += len(code.encode('utf-8'))
+    print(f'{before // 1024} KB -> {after // 1024} KB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,129 @@
+import ast
+import os
+import select
+import struct
+import threading
+
+# inotify(7) constants from <sys/inotify.h>
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+EVENT = struct.Struct('iIII') # wd, mask, cookie, len; the name follows, NUL padded
+
+
+def _matches(name, patterns):
+    # Patterns starting with '.' are suffixes, the rest exact file names
+    return any(name.endswith(p) if p.startswith('.') else name == p for p in patterns)
+
+
+def snapshot(dirs):
+    # {(dir, name): (mtime_ns, size)} of the watched files, for the polling fallback
+    state = {}
+    for dir_path, patterns in dirs.items():
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if _matches(entry.name, patterns) and entry.is_file():
+                        st = entry.stat()
+                        state[dir_path, entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+    return state
+
+
+def read_constants(path, names):
+    # {name: value} of the literal module-level assignments 'names' in a Python file, read with ast
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            if node.targets[0].id in names:
+                try:
+                    values[node.targets[0].id] = ast.literal_eval(node.value)
+                except ValueError:
+                    pass
+    return values
+
+
+class Watcher:
+    # Reports changed files in a few directories ({dir: patterns}) to on_change(set of
+    # (dir, name)). With inotify a thread blocks in select() until the kernel reports
+    # something, so an idle box pays nothing. Where inotify is missing (not Linux, no
+    # watches left) start() returns False and the owner calls poll() now and then;
+    # that compares one scandir per directory against the last snapshot.
+    def __init__(self, dirs, on_change):
+        self.dirs = dirs
+        self.on_change = on_change
+        self.fd = None
+        self.wds = {} # wd -> dir
+        self.state = snapshot(dirs)
+        self.thread = None
+        self.stop_r, self.stop_w = None, None
+
+    def start(self):
+        import ctypes # Only here, ctypes.util alone costs more than the rest of the service's imports
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return False
+            for dir_path in self.dirs:
+                wd = libc.inotify_add_watch(fd, os.fsencode(dir_path), WATCH_MASK)
+                if wd < 0:
+                    os.close(fd)
+                    self.wds = {}
+                    return False
+                self.wds[wd] = dir_path
+        except (OSError, AttributeError):
+            return False
+        self.fd = fd
+        self.stop_r, self.stop_w = os.pipe()
+        self.thread = threading.Thread(target=self._run, name='shadertoy-cycler-watch', daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if self.thread:
+            os.write(self.stop_w, b'x')
+            self.thread.join(2)
+            self.thread = None
+            for fd in (self.fd, self.stop_r, self.stop_w):
+                os.close(fd)
+            self.fd = None
+
+    def poll(self):
+        # Changes since the last poll, for owners without inotify
+        state = snapshot(self.dirs)
+        changed = {key for key in state.keys() | self.state.keys() if state.get(key) != self.state.get(key)}
+        self.state = state
+        return changed
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([self.fd, self.stop_r], [], [])
+            if self.stop_r in ready:
+                return
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                continue
+            changed = set()
+            offset = 0
+            while offset + EVENT.size <= len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += EVENT.size + length
+                dir_path = self.wds.get(wd)
+                if dir_path and name and _matches(name, self.dirs[dir_path]):
+                    changed.add((dir_path, name))
+            if changed:
+                self.on_change(changed)
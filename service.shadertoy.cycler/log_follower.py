@@ -0,0 +1,70 @@
+import os
+import re
+
+MAX_READ = 1024 * 1024 # Bytes taken per poll, a log flood is worked off over several polls
+
+# What screensaver.shadertoy writes to kodi.log when a shader does not make it to the screen.
+# Patterns with a 'file' group name the shader; the others are pinned on the shader just switched to.
+SHADER_ERRORS = [
+    re.compile(r"Failed to compile shadertoy shaders \(current shadertoy file '(?P<file>[^']*)'\)"),
+    re.compile(r"CShader::\w+: Failed to open file '(?P<file>[^']*\.frag\.glsl)'"),
+    re.compile(r'GL: Error compiling fragment shader'),
+    re.compile(r'CPixelShader::\w+: '),
+    re.compile(r'CShaderProgram::\w+: '),
+]
+
+
+class LogFollower:
+    # Incremental reader of a growing log (kodi.log). Starts at the current end,
+    # so history is never replayed, and keeps a byte offset. A poll with nothing
+    # new costs one stat. A different inode or a file shorter than the offset
+    # means the log was rotated or truncated: reading starts over at its top.
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.partial = b'' # Last line until its newline arrives
+        self.skip_to_end()
+
+    def skip_to_end(self):
+        # Forget what was logged up to now, e.g. while the screensaver was off
+        self.partial = b''
+        try:
+            st = os.stat(self.path)
+            self.inode, self.offset = st.st_ino, st.st_size
+        except OSError:
+            self.inode, self.offset = None, 0
+
+    def read_lines(self):
+        # Complete lines written since the last call
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.inode, self.offset, self.partial = st.st_ino, 0, b''
+        if st.st_size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(MAX_READ)
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode('utf-8', 'replace').rstrip('\r') for line in lines]
+
+
+def shader_errors(lines, skip=None):
+    # [(shader file name or None, line)] for the lines matching SHADER_ERRORS. Lines
+    # containing 'skip' (our own log prefix, which may quote an error) are left alone.
+    found = []
+    for line in lines:
+        if skip and skip in line:
+            continue
+        for pattern in SHADER_ERRORS:
+            m = pattern.search(line)
+            if m:
+                path = m.groupdict().get('file')
+                found.append((os.path.basename(path) if path else None, line))
+                break
+    return found
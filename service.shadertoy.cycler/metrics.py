@@ -0,0 +1,130 @@
+import bisect
+import json
+import threading
+import time
+
+import atomicfile
+
+# Upper bucket bounds in milliseconds, the last bucket catches everything above
+DEFAULT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    # Fixed buckets, so memory stays constant however long the service runs.
+    # Percentiles are the upper bound of the bucket they fall in.
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 2),
+            'min': round(self.min, 2),
+            'max': round(self.max, 2),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            # Only non-empty buckets, keyed by upper bound ('inf' for the overflow bucket)
+            'buckets': {str(self.buckets[i]) if i < len(self.buckets) else 'inf': n
+                        for i, n in enumerate(self.counts) if n},
+        }
+
+
+class Metrics:
+    # Counters, gauges and histograms shared by the service threads. Cheap enough
+    # to update on every switch; snapshot() is what gets written or served.
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            uptime = self.clock() - self.started
+            return {
+                'uptime_s': round(uptime),
+                'time': int(time.time()),
+                'counters': dict(self.counters),
+                # Counters over the service uptime, e.g. cycles per hour to compare with CYCLE_INTERVAL
+                'per_hour': {name: round(n * 3600 / uptime, 2) for name, n in self.counters.items()} if uptime > 0 else {},
+                'gauges': dict(self.gauges),
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def save(self, path):
+        atomicfile.write_json(path, self.snapshot())
+
+
+class MetricsServer:
+    # GET / on 127.0.0.1:port returns the current snapshot as JSON. Bound to the
+    # loopback interface only, e.g. for `curl localhost:port` over ssh.
+    def __init__(self, metrics, port):
+        import http.server # Only when METRICS_PORT is set, it pulls in half the stdlib
+
+        registry = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(registry.snapshot(), separators=(',', ':'), sort_keys=True).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Keep requests out of stderr
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='shadertoy-cycler-metrics', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,195 @@
+import collections
+import math
+import random
+
+
+class _Fenwick:
+    # Prefix sums over integer weights with O(log n) update and weighted search
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.values = [0] * size
+
+    def set(self, index, value):
+        delta = value - self.values[index]
+        if not delta:
+            return
+        self.values[index] = value
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        s = 0
+        count = self.size
+        while count > 0:
+            s += self.tree[count]
+            count -= count & -count
+        return s
+
+    def find(self, target):
+        # Smallest index whose prefix sum exceeds target (0 <= target < total)
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class Playlist:
+    # Batches in which every shader appears 'weight' times (fractional weights
+    # round up or down at random per batch, so 0.5 means every other batch).
+    # Picks are weighted random draws from what is left of the batch, O(log n)
+    # each, and a shader is never picked again within 'min_distance' picks,
+    # including across the boundary into the next batch. In a library of
+    # 2 * min_distance shaders or fewer the distance shrinks to half the library,
+    # so there is still a choice on every pick. Deterministic for a given seed.
+    def __init__(self, shaders, weights=None, min_distance=1, seed=None):
+        self.rng = random.Random(seed)
+        self.min_distance = min_distance
+        self.weights = {}
+        self.names = []
+        self.index = {}
+        self.counts = [] # Copies of each shader left in the current batch
+        self.recent = collections.deque() # Last picks, oldest first, at most distance()
+        self.cooling = collections.Counter() # name -> occurrences in 'recent'
+        self.left = 0 # Picks left in the current batch
+        self.batch = 0 # Number of batches started
+        self.upcoming = None # (name, batch) drawn by peek(), handed out by next()
+        self.picked_batch = 0 # Batch of the shader last returned by next()
+        for name in shaders:
+            self._append(name, (weights or {}).get(name, 1))
+        self.tree = _Fenwick(len(self.names))
+
+    def _append(self, name, weight):
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        self.counts.append(0)
+        self.weights[name] = weight
+
+    def _rebuild(self):
+        self.tree = _Fenwick(len(self.names))
+        for i, name in enumerate(self.names):
+            self._refresh(i)
+
+    def _refresh(self, i):
+        name = self.names[i]
+        self.tree.set(i, 0 if self.cooling[name] else self.counts[i])
+
+    def distance(self):
+        # min_distance, capped so a small library is not forced into one fixed order
+        return min(self.min_distance, len(self.weights) // 2)
+
+    def _copies(self, weight):
+        whole = int(math.floor(weight))
+        return whole + (1 if self.rng.random() < weight - whole else 0)
+
+    def _new_batch(self):
+        self.batch += 1
+        self.left = 0
+        for i, name in enumerate(self.names):
+            self.counts[i] = self._copies(self.weights[name]) if name in self.weights else 0
+            self.left += self.counts[i]
+            self._refresh(i)
+
+    def _draw(self):
+        if not self.left:
+            self._new_batch()
+            if not self.left:
+                return None
+        total = self.tree.total()
+        if total:
+            i = self.tree.find(self.rng.randrange(total))
+        else:
+            # Everything left in the batch is still cooling down (tiny library or
+            # heavy weights): relax the distance and take the least recently shown
+            i = next(self.index[name] for name in self.recent if self.counts[self.index[name]])
+        name = self.names[i]
+        self.counts[i] -= 1
+        self.left -= 1
+        self.recent.append(name)
+        self.cooling[name] += 1
+        self._refresh(i)
+        while len(self.recent) > self.distance():
+            old = self.recent.popleft()
+            self.cooling[old] -= 1
+            if old in self.index:
+                self._refresh(self.index[old])
+        return name
+
+    def peek(self):
+        # The shader next() will return, drawn now so callers can prepare for it
+        if self.upcoming is None:
+            self.upcoming = (self._draw(), self.batch)
+        return self.upcoming[0]
+
+    def next(self):
+        name = self.peek()
+        self.picked_batch = self.upcoming[1]
+        self.upcoming = None
+        return name
+
+    def restore(self, batch, shown, recent):
+        # Continue a batch saved before a restart: 'shown' are the picks already made
+        # in it, 'recent' the last picks (oldest first) that still hold a repeat distance.
+        # Shaders that are new since then simply belong to the restored batch.
+        self.batch = self.picked_batch = batch
+        self.upcoming = None
+        for i, name in enumerate(self.names):
+            self.counts[i] = self._copies(self.weights[name]) if name in self.weights else 0
+        for name in shown:
+            if name in self.index and self.counts[self.index[name]]:
+                self.counts[self.index[name]] -= 1
+        self.left = sum(self.counts)
+        # Shaders deleted, renamed or quarantined since the checkpoint are dropped
+        recent = [name for name in recent if name in self.weights]
+        distance = self.distance()
+        self.recent = collections.deque(recent[-distance:] if distance else ())
+        self.cooling = collections.Counter(self.recent)
+        self._rebuild()
+
+    def remaining(self):
+        # Picks left in the current batch, including a peeked one
+        return self.left + (1 if self.upcoming is not None and self.upcoming[1] == self.batch else 0)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __contains__(self, name):
+        return name in self.weights
+
+    def remove(self, name):
+        if name not in self.weights:
+            return
+        i = self.index[name]
+        del self.weights[name]
+        self.left -= self.counts[i]
+        self.counts[i] = 0
+        self._refresh(i)
+        if self.upcoming is not None and self.upcoming[0] == name:
+            self.upcoming = None
+
+    def add(self, name, weight=1):
+        # New shaders join the current batch once, so they show up without a reshuffle
+        if name in self.weights:
+            self.set_weight(name, weight)
+            return
+        if name in self.index:
+            self.weights[name] = weight
+        else:
+            self._append(name, weight)
+            self._rebuild()
+        i = self.index[name]
+        self.counts[i] = 1
+        self.left += 1
+        self._refresh(i)
+
+    def set_weight(self, name, weight):
+        # Takes effect from the next batch
+        if name in self.weights:
+            self.weights[name] = weight
@@ -0,0 +1,76 @@
+import glob
+import os
+
+import atomicfile
+
+NORMAL = 'normal'
+ECO = 'eco'
+
+
+def load_tiers(path):
+    # {shader: 'low' | 'medium' | 'high'} from the report of scripts/shader_cost.py, {} if missing
+    report = atomicfile.read_json(path, {}) or {}
+    return {name: entry.get('tier') for name, entry in report.get('shaders', {}).items()}
+
+
+def read_temperature(thermal_dir='/sys/class/thermal'):
+    # Hottest thermal zone in degrees C, None where the kernel exposes none (or not Linux)
+    hottest = None
+    for path in glob.glob(os.path.join(thermal_dir, 'thermal_zone*', 'temp')):
+        try:
+            with open(path, 'r') as f:
+                value = int(f.read().strip()) / 1000.0 # millidegrees
+        except (OSError, ValueError):
+            continue
+        if hottest is None or value > hottest:
+            hottest = value
+    return hottest
+
+
+def in_window(hour, window):
+    # True if 'hour' (0-23) falls in window (start, end), which may wrap past midnight
+    if not window:
+        return False
+    start, end = window
+    if start == end:
+        return False
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class PowerPolicy:
+    # Decides between normal cycling and eco mode (cheap shaders, longer interval).
+    # Eco starts after 'eco_after' seconds of uninterrupted screensaver, inside the
+    # local-time 'hours' window, or when the SoC reaches 'hot_c'; with thermal
+    # hysteresis it only counts as cool again below 'cool_c'.
+    def __init__(self, eco_after=0, hours=None, hot_c=0, cool_c=0):
+        self.eco_after = eco_after
+        self.hours = hours
+        self.hot_c = hot_c
+        self.cool_c = cool_c if cool_c else hot_c
+        self.hot = False
+        self.temperature = None # Last successful reading, kept while the sensor does not answer
+        self.mode = NORMAL
+        self.reason = ''
+
+    def update(self, idle_seconds, hour, temperature):
+        # Returns (mode, reason); reason says what put the box in eco mode
+        if self.hot_c and temperature is not None:
+            self.temperature = temperature
+            if temperature >= self.hot_c:
+                self.hot = True
+            elif temperature < self.cool_c:
+                self.hot = False
+        if self.hot:
+            # A failed read leaves 'hot' as it was, the reason then quotes the last reading
+            reason = f'{self.temperature:.0f} C' if self.temperature is not None else 'thermal'
+        elif self.eco_after and idle_seconds >= self.eco_after:
+            reason = f'idle {idle_seconds / 60:.0f} min'
+        elif in_window(hour, self.hours):
+            reason = f'{self.hours[0]:02d}:00-{self.hours[1]:02d}:00 window'
+        else:
+            reason = ''
+        self.mode = ECO if reason else NORMAL
+        self.reason = reason
+        return self.mode, reason
@@ -0,0 +1,62 @@
+import os
+import threading
+
+CHUNK_SIZE = 256 * 1024
+
+
+def warm(paths, budget_bytes):
+    # Pull files into the OS page cache, in order, until budget_bytes is used up.
+    # posix_fadvise(WILLNEED) lets the kernel read ahead on its own; where it is
+    # missing the file is read and thrown away through one small buffer.
+    # Returns the number of bytes requested.
+    used = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        if used + size > budget_bytes:
+            continue
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+            else:
+                while os.read(fd, CHUNK_SIZE):
+                    pass
+        finally:
+            os.close(fd)
+        used += size
+    return used
+
+
+class Prefetcher:
+    # One background thread that warms the files of the shader coming up next.
+    # Only the latest request matters: a new one replaces a pending one.
+    def __init__(self, budget_bytes, on_done=None):
+        self.budget_bytes = budget_bytes
+        self.on_done = on_done # Called as on_done(paths, bytes warmed or exception)
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def request(self, paths):
+        with self._cond:
+            self._pending = list(paths)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='shadertoy-cycler-prefetch', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                paths, self._pending = self._pending, None
+            try:
+                result = warm(paths, self.budget_bytes)
+            except Exception as e:
+                result = e
+            if self.on_done:
+                self.on_done(paths, result)
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import xbmcgui
+
+import textures
+
+SHADER_SUFFIX = '.frag.glsl'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class Previews:
+    # Shader-Screens screenshots ('<shader base name>.png') as small JPEGs in
+    # cache_dir, so Kodi decodes a few KB instead of a 1.4 MB PNG when the
+    # overlay opens. Copies are made one at a time on a background thread
+    # started through 'start' (target, name), latest request() first, and kept
+    # like the texture variants (the name carries the source mtime), so after
+    # the first run a request for an existing copy costs a stat.
+    def __init__(self, screens_dir, cache_dir, width, start=None):
+        self.screens_dir = screens_dir
+        self.cache_dir = cache_dir
+        self.width = width
+        self.start = start or (lambda target, name: threading.Thread(target=target, name=name, daemon=True).start())
+        self.sources = {} # shader -> screenshot path, from one listing in load()
+        self.ready = {} # shader -> downscaled copy
+        self._pending = []
+        self._cond = threading.Condition()
+        self._started = False
+
+    def load(self):
+        try:
+            names = os.listdir(self.screens_dir)
+        except OSError:
+            names = []
+        sources = {}
+        for name in sorted(names):
+            base, ext = os.path.splitext(name)
+            if ext.lower() in IMAGE_EXTENSIONS:
+                sources.setdefault(base + SHADER_SUFFIX, os.path.join(self.screens_dir, name))
+        self.sources = sources
+        return len(sources)
+
+    def path(self, shader):
+        # Best image for the overlay right now: the small copy, else the screenshot itself, else None
+        return self.ready.get(shader) or self.sources.get(shader)
+
+    def request(self, shaders):
+        # Queue 'shaders' ahead of anything still waiting from earlier requests
+        with self._cond:
+            wanted = [shader for shader in dict.fromkeys(shaders) if shader in self.sources and shader not in self.ready]
+            self._pending = wanted + [shader for shader in self._pending if shader not in wanted]
+            if self._pending and not self._started:
+                self._started = True
+                self.start(self._run, 'shadertoy-cycler-previews')
+            self._cond.notify()
+
+    def _run(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError:
+            pass # prepare() fails below and the originals are used
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                shader = self._pending.pop(0)
+            if shader in self.ready:
+                continue
+            try:
+                self.ready[shader] = textures.prepare(self.sources[shader], self.cache_dir, self.width, 'jpg')
+            except Exception:
+                self.ready[shader] = self.sources[shader] # No Pillow (or a bad file): Kodi decodes the original
+
+
+class Overlay:
+    # Fullscreen dialog covering the screensaver switch: the outgoing shader's
+    # preview, with the incoming one fading in over it. Kodi draws it while the
+    # screensaver is down and brought back; close() fades it out again.
+    def __init__(self, fade_ms):
+        self.fade_ms = fade_ms
+        self.window = None
+
+    def show(self, outgoing, incoming):
+        # Image paths, either may be None; nothing is shown without an incoming image
+        if not incoming:
+            return False
+        window = xbmcgui.WindowDialog()
+        width, height = window.getWidth(), window.getHeight()
+        fade = f'effect=fade start=0 end=100 time={self.fade_ms}'
+        controls = []
+        if outgoing:
+            controls.append(xbmcgui.ControlImage(0, 0, width, height, outgoing, aspectRatio=0))
+        top = xbmcgui.ControlImage(0, 0, width, height, incoming, aspectRatio=0)
+        top.setAnimations([('WindowOpen', fade), ('WindowClose', f'effect=fade start=100 end=0 time={self.fade_ms}')])
+        controls.append(top)
+        window.addControls(controls)
+        window.show()
+        self.window = window
+        return True
+
+    def close(self):
+        if self.window is not None:
+            self.window.close()
+            self.window = None
@@ -0,0 +1,32 @@
+import time
+
+import atomicfile
+
+
+class Quarantine:
+    # Shaders that failed to compile or load on this box, kept out of the rotation
+    # across restarts. Each entry remembers the hash of the failing source, read when it was quarantined:
+    # once the file is edited (or replaced by a fixed version) it is released.
+    def __init__(self, path):
+        self.path = path
+        self.shaders = atomicfile.read_json(path, {}).get('shaders', {})
+
+    def add(self, shader, source_hash, reason):
+        self.shaders[shader] = {'hash': source_hash, 'reason': reason, 'time': int(time.time())}
+        atomicfile.write_json(self.path, {'shaders': self.shaders})
+
+    def release_changed(self, index):
+        # Drop entries whose shader is gone or has a different hash in 'index'; returns their names
+        released = [shader for shader, entry in self.shaders.items()
+                    if shader not in index or index[shader]['hash'] != entry['hash']]
+        if released:
+            for shader in released:
+                del self.shaders[shader]
+            atomicfile.write_json(self.path, {'shaders': self.shaders})
+        return released
+
+    def __contains__(self, shader):
+        return shader in self.shaders
+
+    def __len__(self):
+        return len(self.shaders)
@@ -0,0 +1,55 @@
+import collections
+
+import atomicfile
+
+
+class RotationLog:
+    # Append-only checkpoint of the rotation, so a pass through the library
+    # carries on across Kodi restarts. The file looks like
+    #
+    #     batch 7
+    #     recent foo.frag.glsl      <- picks from the previous batch still holding a repeat distance
+    #     bar.frag.glsl             <- shown in batch 7, one line per switch
+    #
+    # A switch appends one line. Starting a batch rewrites the file atomically
+    # with the new header. A torn last line after a crash is ignored.
+    def __init__(self, path, keep):
+        self.path = path
+        self.batch = None
+        self.recent = collections.deque(maxlen=max(keep, 0))
+
+    def load(self):
+        # (batch, shown, recent) from disk, or None when there is no usable checkpoint
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = f.read()
+        except OSError:
+            return None
+        lines = data.split('\n')
+        if not data.endswith('\n'):
+            lines = lines[:-1] # Torn write
+        if not lines or not lines[0].startswith('batch '):
+            return None
+        try:
+            batch = int(lines[0][6:])
+        except ValueError:
+            return None
+        carried, shown = [], []
+        for line in lines[1:]:
+            if line.startswith('recent '):
+                carried.append(line[7:])
+            elif line:
+                shown.append(line)
+        self.batch = batch
+        self.recent.clear()
+        self.recent.extend(carried + shown)
+        return batch, shown, list(self.recent)
+
+    def record(self, name, batch):
+        if batch != self.batch:
+            header = [f'batch {batch}'] + [f'recent {recent}' for recent in self.recent]
+            atomicfile.write_bytes(self.path, ('\n'.join(header) + '\n').encode('utf-8'))
+            self.batch = batch
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(name + '\n')
+        self.recent.append(name)
@@ -0,0 +1,108 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Scheduler:
+    # Named one-shot timers on a heap, run by a single thread that sleeps until
+    # the earliest deadline. With no timers pending the thread waits on a
+    # condition without any timeout, so an idle service never wakes up.
+    # Scheduling a name that is already pending replaces the old deadline.
+    def __init__(self, clock=time.monotonic, on_error=None):
+        self.clock = clock
+        self.on_error = on_error # Called as on_error(name, exception) when a callback raises
+        self._heap = [] # (deadline, seq, name)
+        self._timers = {} # name -> (seq, callback) of the live timer
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def schedule(self, name, delay, callback):
+        with self._cond:
+            seq = next(self._seq)
+            self._timers[name] = (seq, callback)
+            heapq.heappush(self._heap, (self.clock() + delay, seq, name))
+            self._cond.notify()
+
+    def cancel(self, name):
+        # Stale heap entries are skipped when they come up, no need to search the heap
+        with self._cond:
+            self._timers.pop(name, None)
+
+    def cancel_all(self):
+        with self._cond:
+            self._timers.clear()
+            self._heap = []
+
+    def pending(self, name):
+        with self._cond:
+            return name in self._timers
+
+    def next_deadline(self):
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap:
+            deadline, seq, name = self._heap[0]
+            timer = self._timers.get(name)
+            if timer is not None and timer[0] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def _next_due(self):
+        # Block until a timer is due (returns its name and callback) or stop() (returns None)
+        with self._cond:
+            while not self._stopped:
+                self._drop_stale()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                deadline, seq, name = heapq.heappop(self._heap)
+                return name, self._timers.pop(name)[1]
+            return None
+
+    def run_due(self):
+        # Run every timer whose deadline has passed, without blocking. Returns how many ran.
+        ran = 0
+        while True:
+            with self._cond:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > self.clock():
+                    return ran
+                deadline, seq, name = heapq.heappop(self._heap)
+                callback = self._timers.pop(name)[1]
+            self._call(name, callback)
+            ran += 1
+
+    def _call(self, name, callback):
+        try:
+            callback()
+        except Exception as e:
+            if self.on_error:
+                self.on_error(name, e)
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            self._call(*due)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='shadertoy-cycler-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -2,32 +2,124 @@ import xbmc
 import xbmcaddon
 import xbmcvfs
 import os
-import random
+import socket
+import sys
+import threading
 import time
-import xml.etree.ElementTree as ET
+
+import bindings
+import cost_profile
+import glsl_minify
+import hot_reload
+import log_follower
+import metrics
+import playlist
+import power_policy
+import prefetch
+import preview_overlay
+import quarantine
+import rotation_state
+import settings_writer
+import scheduler
+import service_log
+import shader_index
+import textures
 
 ADDON = xbmcaddon.Addon()
 ADDON_ID = ADDON.getAddonInfo('id') # Will be "service.shadertoy.cycler"
 SHADER_PATH = xbmcvfs.translatePath('special://home/addons/screensaver.shadertoy/resources/shaders/')
 SETTINGS_PATH = "/storage/.kodi/userdata/addon_data/screensaver.shadertoy/settings.xml"
 TEXTURE_PATH = xbmcvfs.translatePath('special://home/addons/screensaver.shadertoy/resources/')
+BINDINGS_PATH = os.path.join(xbmcvfs.translatePath(ADDON.getAddonInfo('path')), 'resources', 'bindings.json')
 CYCLE_INTERVAL = 60 # 10 seconds as set
 LOG_INTERVAL = 52    # Log every 30 seconds
+LOG_LEVEL = xbmc.LOGINFO   # Lowest level written to kodi.log, xbmc.LOGDEBUG for per-switch detail (gap, textures, settings.xml)
+STATUS_LOG_INTERVAL = 600  # The LOG_INTERVAL status line reaches kodi.log at most this often, the rest only the ring buffer
+LOG_REPEAT_INTERVAL = 600  # Recurring errors (settings.xml, rotation state, timers) are written at most this often
+LOG_RING_SIZE = 1000       # Recent messages of every level kept in memory, dumped with NotifyAll(service.shadertoy.cycler,dumplog)
+MIN_REPEAT_DISTANCE = 100 # A shader is not shown again within this many switches (at most half the library), also across batches
+FAVORITE_SHADERS = {}     # Shown this many times per batch instead of once, e.g. {'zen.frag.glsl': 2, 'ropes.frag.glsl': 0.5}
+SWITCH_MODE = 1      # 1 = reactivate as soon as Kodi reports the deactivation, 0 = old fixed 2 second sleep
+SWITCH_TIMEOUT = 2   # Seconds to wait for Kodi's deactivate/activate callbacks before carrying on
+LATE_CALLBACK_GRACE = 10 # Seconds past SWITCH_TIMEOUT in which a deactivation callback is still taken as our own switch
 SetToTester = 1      # Set to 1 to use only testershader.frag.glsl, 0 to cycle through FIXED_SHADERS
+RESTRICT_TO_FIXED_SHADERS = 1 # 1 = cycle only shaders listed in FIXED_SHADERS, 0 = every *.frag.glsl in SHADER_PATH
+EXCLUDED_SHADERS = []         # Never cycled, e.g. ['bubblehell.frag.glsl']. Files starting with '-' are always skipped
+PROFILE_PATH = xbmcvfs.translatePath(ADDON.getAddonInfo('profile')) # addon_data/service.shadertoy.cycler/
+SHADER_INDEX_PATH = os.path.join(PROFILE_PATH, 'shader_index.json')
+TEXTURE_MAX_SIZE = 512   # Bound textures larger than this are downscaled once into addon_data, 0 = always full size (NUC).
+                         # 512 shrinks the 17 bound textures of 1024px and up (a 1024x1024 one is 4 MB of GPU memory, 1 MB at 512);
+                         # 1024 would only touch the 3 larger ones
+TEXTURE_FORMAT = 'png'   # Format of the downscaled copies, 'jpg' is smaller but drops alpha
+TEXTURE_CACHE_PATH = os.path.join(PROFILE_PATH, 'textures')
+MINIFY_SHADERS = 1       # Point Kodi at comment/whitespace/dead-#ifdef stripped copies in addon_data, 0 = original files (readable GL errors)
+SHADER_CACHE_PATH = os.path.join(PROFILE_PATH, 'shaders')
+PREFETCH_BUDGET_MB = 16  # Page cache warmed for the next shader and its textures after each switch, 0 = off
+ROTATION_STATE_PATH = os.path.join(PROFILE_PATH, 'rotation.txt') # Current batch, so a pass survives Kodi restarts
+PROFILE_FPS = 1          # 1 = sample Kodi's render FPS while each shader is shown and keep per-box stats
+FPS_SAMPLE_INTERVAL = 5  # Seconds between System.FPS samples
+FPS_WARMUP = 5           # Seconds after a switch before sampling (shader compile, texture upload)
+FPS_FLOOR = 20           # Shaders averaging below this FPS on this box leave the rotation, 0 = keep all
+FPS_MIN_SAMPLES = 6      # Samples needed before a shader can be judged against FPS_FLOOR
+FPS_BUCKETS = (10, 15, 20, 25, 30, 40, 50, 60) # Histogram buckets for System.FPS samples in metrics.json
+COST_TABLE_PATH = os.path.join(PROFILE_PATH, f'shader_cost_{socket.gethostname()}.json')
+LOG_DUMP_PATH = os.path.join(PROFILE_PATH, 'log_ring.txt')
+LOG_LEVEL_NAMES = {xbmc.LOGDEBUG: 'DEBUG', xbmc.LOGINFO: 'INFO', xbmc.LOGWARNING: 'WARNING', xbmc.LOGERROR: 'ERROR', xbmc.LOGFATAL: 'FATAL'}
+
+# Every message goes through this: LOG_LEVEL filter, de-duplication, per-key rate limits, ring buffer
+logger = service_log.Logger(xbmc.log, ADDON_ID, LOG_LEVEL, LOG_RING_SIZE)
+METRICS_PATH = os.path.join(PROFILE_PATH, 'metrics.json') # Switch latency, write time and counters, see metrics.py
+METRICS_INTERVAL = 300   # Seconds between snapshots to METRICS_PATH while the screensaver runs, 0 = only on deactivation/exit
+METRICS_PORT = 0         # Serve the snapshot on http://127.0.0.1:<port>/, 0 = off
+POWER_POLICY = 1         # 1 = eco mode (cheap shaders, ECO_CYCLE_INTERVAL) after long idle, at night or when hot, 0 = always the full library
+ECO_AFTER_MINUTES = 60   # Minutes of uninterrupted screensaver before eco mode, 0 = never by idle time
+ECO_HOURS = (1, 7)       # Local hours [start, end) always in eco mode, may wrap past midnight, None = no window
+ECO_TIERS = ('low',)     # Cost classes from resources/shader_cost.json (scripts/shader_cost.py) shown in eco mode
+ECO_CYCLE_INTERVAL = 300 # Seconds per shader in eco mode, fewer switches and shader compiles
+THERMAL_PATH = '/sys/class/thermal'
+THERMAL_HOT_C = 70       # Eco mode while the hottest thermal zone is at or above this, 0 = ignore temperature
+THERMAL_COOL_C = 62      # ...until it drops below this again
+QUARANTINE_FAILED = 1    # 1 = follow kodi.log for shader compile/load errors, keep failing shaders out and switch away at once, 0 = off
+KODI_LOG_PATH = xbmcvfs.translatePath('special://logpath/kodi.log')
+LOG_FOLLOW_INTERVAL = 2  # Seconds between kodi.log polls while the screensaver runs, a poll with nothing new is one stat
+FAILURE_WINDOW = 15      # Seconds after a switch in which errors that name no file count against the new shader
+QUARANTINE_PATH = os.path.join(PROFILE_PATH, 'quarantine.json') # Released again when the shader file changes
+LAZY_START = 1           # 1 = load the library LAZY_START_DELAY seconds after Kodi boot (or at the first activation), 0 = at service start
+LAZY_START_DELAY = 120   # Seconds; the first activation loads it at once, before the first pick
+BACKGROUND_NICE = 10     # Niceness of the texture/minify worker threads (Linux, per thread), 0 = unchanged
+SHADER_COST_PATH = os.path.join(xbmcvfs.translatePath(ADDON.getAddonInfo('path')), 'resources', 'shader_cost.json')
+HOT_RELOAD = 1           # 1 = apply added/removed/edited shaders, textures, bindings.json, shader_cost.json and the lists below without a restart
+WATCH_POLL_INTERVAL = 30 # Seconds between checks while the screensaver runs, only where inotify is not available
+RELOAD_DELAY = 2         # Seconds after the last change before reloading, so a copy of many files is applied once
+CONFIG_PATH = os.path.abspath(__file__) # This file: the constants in RELOADABLE are re-read when it is saved
+RELOADABLE = ('FIXED_SHADERS', 'EXCLUDED_SHADERS', 'RESTRICT_TO_FIXED_SHADERS', 'FAVORITE_SHADERS')
+PREVIEW_OVERLAY = 1      # 1 = cover the switch gap with the Shader-Screens images of the old and new shader, 0 = Kodi's GUI shows through
+PREVIEW_PATH = xbmcvfs.translatePath('special://home/addons/screensaver.shadertoy/Shader-Screens/')
+PREVIEW_CACHE_PATH = os.path.join(PROFILE_PATH, 'previews') # Downscaled JPEG copies, made ahead of the switch that shows them
+PREVIEW_SIZE = 640       # Longest side of the copies; Kodi stretches them to the screen, they are only on for a moment
+PREVIEW_FADE_MS = 400    # Crossfade from the old shader's image to the new one's
+PREVIEW_HOLD_MS = 300    # Overlay stays up this long after the activation, while the new shader compiles underneath
 
 
 ##############################################
 #   VERIFY SHADERS ARE CYCLING PROPERLY
 ##############################################
 #
-#   In Terminal:   cat /storage/.kodi/temp/kodi.log | grep "Shaders in batch" > listme.txt
+#   Quickest: copy kodi.old.log and kodi.log off the box and run, from the repository root,
+#       python scripts/rotation_audit.py kodi.old.log kodi.log
+#   It reports duplicates per batch, counter jumps, stalls and dwell times in one pass.
+#   The manual check below does the same by hand:
+#
+#   In Terminal:   cat /storage/.kodi/temp/kodi.log | grep "Cycling to" > listme.txt
+#       (one line per switch; the "Service Running... Shaders in batch" status line is held back by
+#        STATUS_LOG_INTERVAL and shows only about one switch in ten, so it cannot be used for this)
 #   Open file listme in Notepad++
-#       Go to Search > Replace: in find type:  ^.*(?=Current\s) - Replace with (leave blank). 
+#       Go to Search > Replace: in find type:  ^.*(?=Cycling to\s) - Replace with (leave blank). 
 #           This will strip the timestamps, etc.
-#       Go to Search > Replace: in find type:  "Current shader: " - Replace with (leave blank).  
-#       Go to Search > Replace: in find type:  "Shaders in batch: " - Replace with "File Number: " 
-#       Go to Edit > Line Operations > and click on "Remove Consecutive Duplicate Lines"
-#       Delete repeat cycle lines, and lines not relevant to file list.
+#       Go to Search > Replace: in find type:  "Cycling to " - Replace with (leave blank).  
+#       Go to Search > Replace: in find type:  " shaders remaining in current batch." - Replace with (leave blank).  
+#       Go to Search > Replace: in find type:  ". " - Replace with " File Number: " 
+#       Delete lines not relevant to file list.
 #
 #   In Grok or ChatGPT eneter the below:
 #       Please find file list below. In the below list, each line contains a *.frag.glsl file name. The file name is followed by a File Number. Please look at file names and advise if there are more than one unique file name on the list. Please note that the File Number should be unique as well and should count down in the number sequence. Please ignore if the same file name and unique FILE NUMBER repeat one after the other. There is no need to itemize line by line in your response. Please only highlight if any file names repeat, or it the File Numbers are not in sequential order from high to low. 
@@ -36,9 +128,13 @@ SetToTester = 1      # Set to 1 to use only testershader.frag.glsl, 0 to cycle t
 ##############################################
 
 #* Hernando - Notes on Customizing
-#    after any change, Kodi must be restarted. use this to re-start:
+#    new, edited or deleted shaders and textures, bindings.json, shader_cost.json and the
+#    FIXED_SHADERS / EXCLUDED_SHADERS / RESTRICT_TO_FIXED_SHADERS / FAVORITE_SHADERS lists in
+#    this file are picked up while running (HOT_RELOAD). After any other change, Kodi must be restarted:
 #        systemctl restart kodi
 # to check kodi log to diagnose shaders:     cat /storage/.kodi/temp/kodi.log
+# shaders that failed to compile are parked in addon_data/service.shadertoy.cycler/quarantine.json,
+#    saving a fixed version of the file releases it (while running with HOT_RELOAD, otherwise on the next start)
 
 #
 #    Texture extraction command in Libreelec:
@@ -551,529 +647,711 @@ class ShaderCycler(xbmc.Monitor):
     def __init__(self):
         super().__init__()
         self.current_shader = ''
-        self.all_shaders = list(FIXED_SHADERS) # Use a copy of the fixed list as the master
-        self.remaining_shaders = [] # Shaders to be cycled through in the current "batch"
-        self.is_cycling = False
-        self.is_refreshing = False
+        self.all_shaders = [] # Valid shaders, filled by load_shaders
+        self.playlist = playlist.Playlist([]) # Shuffled batches over all_shaders
+        self.eco_playlist = playlist.Playlist([]) # Batches over the ECO_TIERS part of all_shaders
+        self.power = power_policy.PowerPolicy(ECO_AFTER_MINUTES * 60, ECO_HOURS, THERMAL_HOT_C, THERMAL_COOL_C)
+        self.tiers = {} # {shader: 'low' | 'medium' | 'high'}, filled by load_library
+        self.activated_at = 0 # time.monotonic() of the last real activation
+        self.quarantine = quarantine.Quarantine(QUARANTINE_PATH) # Shaders that failed to compile or load on this box
+        self.log_follower = log_follower.LogFollower(KODI_LOG_PATH) if QUARANTINE_FAILED == 1 else None
+        self.watcher = None # hot_reload.Watcher on the library and config files
+        self.inotify = False # False: the watcher is polled from a timer while the screensaver runs
+        self.pending_changes = set() # (dir, name) seen by the watcher and not applied yet
+        self.prefetcher = prefetch.Prefetcher(PREFETCH_BUDGET_MB * 1024 * 1024, self.on_prefetch_done)
+        self.previews = preview_overlay.Previews(PREVIEW_PATH, PREVIEW_CACHE_PATH, PREVIEW_SIZE, self.start_background) # Listed by load_library
+        self.rotation_log = rotation_state.RotationLog(ROTATION_STATE_PATH, MIN_REPEAT_DISTANCE)
+        self.shader_index = {} # {name: size, mtime, hash} of every shader in SHADER_PATH
+        self.minified = {} # {name: minified copy in SHADER_CACHE_PATH}, filled by minify_shaders
+        self.minify_lock = threading.Lock() # One build_cache at a time, each prunes what is not in its own manifest
+        self.texture_lock = threading.Lock() # One prepare_all at a time, a new variant prunes the older ones
+        # Switches run only on the scheduler thread; the Monitor callbacks just flip state under
+        # state_lock and set events, so they return at once and never wait on a switch.
+        self.switch_lock = threading.Lock() # Held for a whole cycle, a second one is skipped, not queued
+        self.state_lock = threading.Lock() # Guards switch_phase, own_deactivation_until, screensaver_started and re-arming timers
+        self.switch_phase = None # None, 'deactivating', 'deactivated' or 'activating' while set_shader refreshes
+        self.own_deactivation_until = 0 # Deadline for the callback of our DeactivateScreensaver, 0 once it came
+        self.switch_cancelled = threading.Event() # Set by a real deactivation, cleared by a real activation
+        self.deactivated_event = threading.Event() # Set by onScreensaverDeactivated during our own refresh
+        self.activated_event = threading.Event() # Set by onScreensaverActivated during our own refresh
         self.screensaver_started = False
-        self.last_cycle = time.time()
-        xbmc.log(f"{ADDON_ID}: Initializing ShaderCycler with {len(self.all_shaders)} shaders potentially available.", xbmc.LOGINFO)
-        self.load_shaders() # This method will populate self.all_shaders with valid ones and shuffle
+        self.scheduler = scheduler.Scheduler(on_error=self.on_timer_error) # Cycle/status deadlines, idle while screensaver is off
+        self.bindings = {}
+        self.cost_table = cost_profile.CostTable(COST_TABLE_PATH) # FPS stats per shader for this box
+        self.shader_shown_at = 0 # time.monotonic() when current_shader came on screen
+        self.metrics = metrics.Metrics()
+        self.metrics_server = None
+        self.settings_writer = settings_writer.SettingsWriter(SETTINGS_PATH, ('shader', 'ownshader') + bindings.CHANNELS)
+        logger.log(f"Initializing ShaderCycler with {len(FIXED_SHADERS)} shaders potentially available.", xbmc.LOGINFO)
+        self.library_loaded = False # Set by load_library, on the scheduler thread when LAZY_START is 1
+        if LAZY_START == 1:
+            # Kodi is busy booting and the screensaver is minutes away: leave the disk alone for now.
+            # start_timers moves this to 0 on an earlier activation, ahead of the first pick.
+            self.scheduler.schedule('load', LAZY_START_DELAY, self.load_library)
+        else:
+            self.load_library()
 
+    def load_library(self):
+        if self.library_loaded:
+            return
+        started = time.monotonic()
+        if POWER_POLICY == 1:
+            self.tiers = power_policy.load_tiers(SHADER_COST_PATH)
+        self.load_shaders() # This method will populate self.all_shaders with valid ones and shuffle
+        self.load_bindings() # Shader -> texture table from resources/bindings.json
+        if TEXTURE_MAX_SIZE:
+            # Decoding multi-MB PNGs can take a while, do it off the startup path
+            self.start_background(self.prepare_textures, 'shadertoy-cycler-textures')
+        if MINIFY_SHADERS:
+            self.start_background(self.minify_shaders, 'shadertoy-cycler-minify')
+
+        if HOT_RELOAD == 1:
+            self.start_watcher()
+        if PREVIEW_OVERLAY == 1 and SetToTester == 0:
+            logger.log(f"{self.previews.load()} shader previews in {PREVIEW_PATH}", xbmc.LOGDEBUG)
+            # Copies for the first switch after activation first, so its crossfade does not load a
+            # full-size PNG, then the rest of the batch; copies from earlier runs are reused
+            upcoming = [rotation.peek() for rotation in (self.playlist, self.eco_playlist) if len(rotation)]
+            self.previews.request(upcoming + self.all_shaders)
+
+        self.library_loaded = True
+        load_ms = (time.monotonic() - started) * 1000
+        self.metrics.set('library_load_ms', round(load_ms, 1))
         if self.all_shaders:
-            xbmc.log(f"{ADDON_ID}: Shaders loaded, starting cycle in background", xbmc.LOGINFO)
+            logger.log(f"Shaders loaded in {load_ms:.0f} ms, starting cycle in background", xbmc.LOGINFO)
+
+    def start_background(self, target, name):
+        # Daemon thread for bulk work (Pillow, minifying), niced so Kodi's UI threads come first
+        def run():
+            if BACKGROUND_NICE and sys.platform.startswith('linux'):
+                try:
+                    os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICE) # Linux: this thread only
+                except OSError:
+                    pass
+            target()
+        threading.Thread(target=run, name=name, daemon=True).start()
 
     def load_shaders(self):
+        # One listing of SHADER_PATH, cached in addon_data and revalidated by each file's size and mtime
+        try:
+            xbmcvfs.mkdirs(PROFILE_PATH)
+            self.shader_index, rebuilt = shader_index.load(SHADER_PATH, SHADER_INDEX_PATH)
+            logger.log(f"Shader index {'rebuilt' if rebuilt else 'loaded from cache'} with {len(self.shader_index)} shaders", xbmc.LOGINFO)
+        except Exception as e:
+            self.shader_index = {}
+            logger.log(f"Failed to index shaders in {SHADER_PATH}: {str(e)}", xbmc.LOGERROR)
+        self.release_quarantine()
+
+        self.all_shaders = self.select_shaders() # Update the master list to only include valid shaders
+        if not self.all_shaders:
+            logger.log("No valid shaders found", xbmc.LOGERROR)
+        else:
+            logger.log(f"Loaded {len(self.all_shaders)} valid shaders", xbmc.LOGINFO)
+            # Weighted batches with no repeats closer than MIN_REPEAT_DISTANCE, each pick is O(log n)
+            self.playlist = playlist.Playlist(self.all_shaders, FAVORITE_SHADERS, MIN_REPEAT_DISTANCE)
+            if SetToTester == 0:
+                state = self.rotation_log.load()
+                if state:
+                    self.playlist.restore(*state)
+                    logger.log(f"Resumed batch {state[0]} with {self.playlist.remaining()} shaders left", xbmc.LOGINFO)
+            if POWER_POLICY == 1:
+                # Not resumed from rotation.txt, eco picks are a side show to the main rotation
+                eco_shaders = self.eco_shaders(self.all_shaders)
+                self.eco_playlist = playlist.Playlist(eco_shaders, FAVORITE_SHADERS, MIN_REPEAT_DISTANCE)
+                logger.log(f"{len(eco_shaders)} shaders in eco tiers {', '.join(ECO_TIERS)}", xbmc.LOGINFO)
+
+    def release_quarantine(self):
+        if self.shader_index and len(self.quarantine):
+            try:
+                for shader in self.quarantine.release_changed(self.shader_index):
+                    logger.log(f"Released {shader} from quarantine, the file changed", xbmc.LOGINFO)
+            except Exception as e:
+                logger.log(f"Failed to update {QUARANTINE_PATH}: {str(e)}", xbmc.LOGERROR)
+
+    def eco_shaders(self, shaders):
+        return [shader for shader in shaders if self.tiers.get(shader) in ECO_TIERS]
+
+    def select_shaders(self):
+        # The shaders of self.shader_index that may be cycled under the current settings
         valid_shaders = []
         if SetToTester == 1:
-            if xbmcvfs.exists(os.path.join(SHADER_PATH, TESTER_SHADER)):
+            if TESTER_SHADER in self.shader_index:
                 valid_shaders.append(TESTER_SHADER)
-                xbmc.log(f"{ADDON_ID}: SetToTester enabled, using only {TESTER_SHADER}", xbmc.LOGINFO)
+                logger.log(f"SetToTester enabled, using only {TESTER_SHADER}", xbmc.LOGINFO)
             else:
-                xbmc.log(f"{ADDON_ID}: Tester shader {TESTER_SHADER} not found in {SHADER_PATH}", xbmc.LOGERROR)
+                logger.log(f"Tester shader {TESTER_SHADER} not found in {SHADER_PATH}", xbmc.LOGERROR)
         else:
-            # Iterate through the initially defined FIXED_SHADERS to validate them
-            for shader in self.all_shaders: # Check against the original list
-                if xbmcvfs.exists(os.path.join(SHADER_PATH, shader)):
-                    valid_shaders.append(shader)
-                else:
-                    xbmc.log(f"{ADDON_ID}: Shader {shader} not found in {SHADER_PATH}, skipping", xbmc.LOGWARNING)
+            # FIXED_SHADERS is an allow list over the index unless RESTRICT_TO_FIXED_SHADERS is 0
+            allow = FIXED_SHADERS if RESTRICT_TO_FIXED_SHADERS == 1 else None
+            valid_shaders, missing = shader_index.select(self.shader_index, allow, EXCLUDED_SHADERS)
+            for shader in missing:
+                logger.log(f"Shader {shader} not found in {SHADER_PATH}, skipping", xbmc.LOGWARNING)
+            slow = [shader for shader in valid_shaders if self.cost_table.too_slow(shader, FPS_FLOOR, FPS_MIN_SAMPLES)]
+            if slow:
+                logger.log(f"Skipping {len(slow)} shaders below {FPS_FLOOR} FPS on this box: {', '.join(slow)}", xbmc.LOGINFO)
+                valid_shaders = [shader for shader in valid_shaders if shader not in slow]
+            failed = [shader for shader in valid_shaders if shader in self.quarantine]
+            if failed:
+                logger.log(f"Skipping {len(failed)} quarantined shaders that failed to compile or load: {', '.join(failed)}", xbmc.LOGINFO)
+                valid_shaders = [shader for shader in valid_shaders if shader not in self.quarantine]
+        self.metrics.set('shaders_quarantined', len(self.quarantine))
+        return valid_shaders
+
+    def start_watcher(self):
+        # Library, textures, the cycler's resources and this file; inotify where the kernel has it
+        dirs = {SHADER_PATH: (shader_index.SHADER_SUFFIX,), TEXTURE_PATH: ('.png', '.jpg', '.jpeg')}
+        dirs.setdefault(os.path.dirname(BINDINGS_PATH), ())
+        dirs[os.path.dirname(BINDINGS_PATH)] += (os.path.basename(BINDINGS_PATH),)
+        dirs.setdefault(os.path.dirname(SHADER_COST_PATH), ())
+        dirs[os.path.dirname(SHADER_COST_PATH)] += (os.path.basename(SHADER_COST_PATH),)
+        dirs.setdefault(os.path.dirname(CONFIG_PATH), ())
+        dirs[os.path.dirname(CONFIG_PATH)] += (os.path.basename(CONFIG_PATH),)
+        try:
+            self.watcher = hot_reload.Watcher(dirs, self.on_files_changed)
+            self.inotify = self.watcher.start()
+        except Exception as e:
+            self.watcher = None
+            logger.log(f"Hot reload disabled, could not watch the library: {str(e)}", xbmc.LOGERROR)
+            return
+        logger.log(f"Watching the shader library {'with inotify' if self.inotify else f'every {WATCH_POLL_INTERVAL}s while the screensaver runs'}", xbmc.LOGINFO)
 
-        self.all_shaders = valid_shaders # Update the master list to only include valid shaders
-        if not self.all_shaders:
-            xbmc.log(f"{ADDON_ID}: No valid shaders found", xbmc.LOGERROR)
-        else:
-            xbmc.log(f"{ADDON_ID}: Loaded {len(self.all_shaders)} valid shaders", xbmc.LOGINFO)
-            # Shuffle the entire list of valid shaders once after loading
-            random.shuffle(self.all_shaders)
-            # Initialize the remaining_shaders list for the first cycle batch
-            self.remaining_shaders = list(self.all_shaders) # Make a copy for the batch
+    def on_files_changed(self, changed):
+        # Watcher thread (or the poll timer): note the files, the reload runs on the scheduler thread.
+        # A reload cancelled by a deactivation is scheduled again by start_timers.
+        with self.state_lock:
+            self.pending_changes |= changed
+            self.scheduler.schedule('reload', RELOAD_DELAY, self.on_reload_timer)
+
+    def on_watch_timer(self):
+        try:
+            changed = self.watcher.poll()
+            if changed:
+                with self.state_lock:
+                    self.pending_changes |= changed
+                self.on_reload_timer()
+        finally:
+            self.rearm('watch', WATCH_POLL_INTERVAL, self.on_watch_timer)
+
+    def on_reload_timer(self):
+        with self.state_lock:
+            changed, self.pending_changes = self.pending_changes, set()
+        if not changed:
+            return
+        self.metrics.inc('reloads')
+        config = (os.path.dirname(CONFIG_PATH), os.path.basename(CONFIG_PATH)) in changed
+        tiers = (os.path.dirname(SHADER_COST_PATH), os.path.basename(SHADER_COST_PATH)) in changed
+        library = any(dir_path == SHADER_PATH for dir_path, name in changed)
+        textures = any(dir_path == TEXTURE_PATH for dir_path, name in changed)
+        if config:
+            self.reload_config()
+        if tiers and POWER_POLICY == 1:
+            self.tiers = power_policy.load_tiers(SHADER_COST_PATH)
+        if library or config or tiers:
+            self.reload_shaders()
+        if textures or (os.path.dirname(BINDINGS_PATH), os.path.basename(BINDINGS_PATH)) in changed:
+            self.load_bindings()
+            if TEXTURE_MAX_SIZE:
+                self.start_background(self.prepare_textures, 'shadertoy-cycler-textures')
+        if library and MINIFY_SHADERS:
+            # Incremental, only new or edited shaders are minified
+            self.start_background(self.minify_shaders, 'shadertoy-cycler-minify')
+
+    def reload_config(self):
+        global FIXED_SHADERS, EXCLUDED_SHADERS, RESTRICT_TO_FIXED_SHADERS, FAVORITE_SHADERS
+        try:
+            values = hot_reload.read_constants(CONFIG_PATH, RELOADABLE)
+        except Exception as e:
+            # Most likely saved halfway through an edit; the next save is picked up again
+            logger.log(f"Could not read {CONFIG_PATH}, keeping the current lists: {str(e)}", xbmc.LOGWARNING)
+            return
+        FIXED_SHADERS = values.get('FIXED_SHADERS', FIXED_SHADERS)
+        EXCLUDED_SHADERS = values.get('EXCLUDED_SHADERS', EXCLUDED_SHADERS)
+        RESTRICT_TO_FIXED_SHADERS = values.get('RESTRICT_TO_FIXED_SHADERS', RESTRICT_TO_FIXED_SHADERS)
+        FAVORITE_SHADERS = values.get('FAVORITE_SHADERS', FAVORITE_SHADERS)
+        logger.log(f"Reloaded {', '.join(sorted(values))} from {CONFIG_PATH}, other changes there still need a restart", xbmc.LOGINFO)
+
+    def reload_shaders(self):
+        # Apply the new index to the running rotation: new shaders join the current batch,
+        # removed ones leave it, everything else keeps its place
+        previous = self.shader_index
+        try:
+            self.shader_index = shader_index.refresh(SHADER_PATH, SHADER_INDEX_PATH, previous)
+        except Exception as e:
+            logger.log(f"Failed to index shaders in {SHADER_PATH}: {str(e)}", xbmc.LOGERROR)
+            return
+        self.release_quarantine()
+        valid_shaders = self.select_shaders()
+        old, new = set(self.all_shaders), set(valid_shaders)
+        eco_old = {shader for shader in self.all_shaders if shader in self.eco_playlist}
+        eco_new = set(self.eco_shaders(valid_shaders)) if POWER_POLICY == 1 else set()
+        for shader in old - new:
+            self.playlist.remove(shader)
+        for shader in eco_old - eco_new:
+            self.eco_playlist.remove(shader)
+        for shader in valid_shaders:
+            weight = FAVORITE_SHADERS.get(shader, 1)
+            if shader in old:
+                self.playlist.set_weight(shader, weight)
+            else:
+                self.playlist.add(shader, weight)
+            if shader in eco_new and shader not in eco_old:
+                self.eco_playlist.add(shader, weight)
+        self.all_shaders = valid_shaders
+        edited = [shader for shader in new & old if previous.get(shader, {}).get('hash') != self.shader_index[shader]['hash']]
+        logger.log(f"Reloaded shader library: {len(new - old)} added, {len(old - new)} removed, {len(edited)} edited, "
+                   f"{len(valid_shaders)} in rotation", xbmc.LOGINFO)
+
+    def load_bindings(self):
+        # Compile resources/bindings.json into a {shader: textures} table once at start,
+        # using a single listing of TEXTURE_PATH to resolve fallback chains.
+        try:
+            manifest = bindings.load_manifest(BINDINGS_PATH)
+            dirs, files = xbmcvfs.listdir(TEXTURE_PATH)
+            self.bindings, problems = bindings.compile_bindings(manifest, TEXTURE_PATH, set(files))
+            for problem in problems:
+                logger.log(problem, xbmc.LOGWARNING)
+            self.metrics.set('texture_binding_problems', len(problems)) # Missing textures and fallbacks taken
+            logger.log(f"Compiled texture bindings for {len(self.bindings)} shaders", xbmc.LOGINFO)
+        except Exception as e:
+            self.bindings = {}
+            logger.log(f"Failed to load texture bindings from {BINDINGS_PATH}: {str(e)}", xbmc.LOGERROR)
+
+    def prepare_textures(self):
+        # Point bindings at copies capped to TEXTURE_MAX_SIZE, made once and reused from addon_data
+        with self.texture_lock:
+            try:
+                variants, errors = textures.prepare_all(bindings.texture_paths(self.bindings), TEXTURE_CACHE_PATH, TEXTURE_MAX_SIZE, TEXTURE_FORMAT)
+            except Exception as e:
+                logger.log(f"Texture preparation failed: {str(e)}", xbmc.LOGERROR)
+                return
+            if variants:
+                self.bindings = bindings.remap(self.bindings, variants) # Swapped in one assignment, lookups stay O(1)
+        for texture_path, error in errors.items():
+            logger.log(f"Using full size {texture_path}, could not downscale: {error}", xbmc.LOGWARNING)
+        self.metrics.set('textures_downscaled', len(variants))
+        if variants:
+            logger.log(f"Using {len(variants)} textures downscaled to {TEXTURE_MAX_SIZE}px", xbmc.LOGINFO)
+
+    def minify_shaders(self):
+        # Less source for the GL driver to chew through on every switch; copies are keyed by
+        # the source file's size and mtime, so only new or edited shaders are minified again.
+        # Startup and hot-reload builds queue up here; the index is read once the lock is held,
+        # so a build that waited works from the newest one and its result is the one kept.
+        with self.minify_lock:
+            try:
+                minified, errors = glsl_minify.build_cache(SHADER_PATH, self.shader_index, SHADER_CACHE_PATH)
+            except Exception as e:
+                logger.log(f"Shader minification failed: {str(e)}", xbmc.LOGERROR)
+                return
+            self.minified = minified
+        for shader, error in errors.items():
+            logger.log(f"Using original {shader}, could not minify: {error}", xbmc.LOGWARNING)
+        self.metrics.set('shaders_minified', len(minified))
+        logger.log(f"Using minified copies of {len(minified)} shaders", xbmc.LOGINFO)
+
+    def shader_file(self, shader):
+        return self.minified.get(shader) or os.path.join(SHADER_PATH, shader)
 
     def update_settings_xml(self, shader):
+        started = time.monotonic()
         try:
-            tree = ET.parse(SETTINGS_PATH)
-            root = tree.getroot()
-            # Update shader settings
-            for setting in root.findall('setting'):
-                if setting.get('id') == 'shader':
-                    setting.text = os.path.join(SHADER_PATH, shader)
-                elif setting.get('id') == 'ownshader':
-                    setting.text = 'true'
-                # Set texture0 (iChannel0) for specific shaders
-                elif setting.get('id') == 'texture0':
-
-                    ################################################
-                    # MODIFIED SECTION FOR paperlantern.frag.glsl iChannel0
-                    if shader == 'paperlantern.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex02hr.png') # Correct texture for iChannel0
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex02.png not found for {shader}", xbmc.LOGWARNING)
-                    # END MODIFIED SECTION FOR paperlantern.frag.glsl iChannel0
-
-
-                    ################################################
-                    # MODIFIED SECTION FOR drawerwall.frag.glsl iChannel0
-                    if shader == 'drawerwall.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex02hr.png') # Correct texture for iChannel0
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex02.png not found for {shader}", xbmc.LOGWARNING)
-                    # END MODIFIED SECTION FOR paperlantern.frag.glsl iChannel0
-
-
-
-
-
-
-                    elif shader == 'paperwaterfall.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex00.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['fur.frag.glsl', 'brutalism.frag.glsl', 'hotrocks.frag.glsl', 'myphobia.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex01.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex01.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['ropes.frag.glsl', 'metalblocks.frag.glsl', 'picassoblocks.frag.glsl', 'brutalismsliced.frag.glsl', 'liquidtin.frag.glsl', 'culebra.frag.glsl', 'marchingdie.frag.glsl', 'fractalcubesteps.frag.glsl', 'spheregears.frag.glsl', 'mengerdrift.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex02.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex02.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader in ['hexapolygon.frag.glsl', 'brutalismsliced.frag.glsl', 'tweeningwidget.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex02hr.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex02.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['eventhorizon.frag.glsl', 'mistymountainhop.frag.glsl', 'peace.frag.glsl', 'ballinahole.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex03a.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture tex03a.png not found, falling back to tex03.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['plutoniancells.frag.glsl', 'sunset.frag.glsl', 'conception.frag.glsl', 'troncraft.frag.glsl', 'abovetheclouds.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex03c.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture {texture_path} not found, falling back to tex03.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['hallofmirrors.frag.glsl', 'londoncafe.frag.glsl', 'infinitycube.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex04.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture tex04.png not found, falling back to tex03.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'beachrain.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex04rain.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'speakers.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex05a.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['woodblocks.frag.glsl', 'wiremesh.frag.glsl', 'truchetfield.frag.glsl', 'woodmenger.frag.glsl', 'wooddonut.frag.glsl', 'creamywood.frag.glsl', 'britneyspaceship.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex05.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex05.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader == 'riverrocks.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'pebbles.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'protoplasm.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex06.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader in ['muscletissue.frag.glsl', 'circuitcity.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex07.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex07.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader in ['crystalgarden.frag.glsl', 'volumetricexplosion.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex09.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'windyplanes.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex10.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex11.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'rorshak2.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex11.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex11.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['permutations.frag.glsl', '50ssitcom.frag.glsl', 'trainview.frag.glsl', 'leather.frag.glsl', 'mandelsnow.frag.glsl', 'noiseanimlava.frag.glsl', 'brownclouds.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex12.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['halftonecell.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex15.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture tex15.png not found, falling back to tex03.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['murkywater.frag.glsl', 'volumetricexplosion.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex16.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'bloodyriver.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex17a.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-
-                    elif shader in ['discswallpaper.frag.glsl', 'biowall.frag.glsl', 'octopus.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex17.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-
-                    elif shader == 'bubblefloat.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex18.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex17.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader in ['caverocks.frag.glsl', 'bonestructure.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex20.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader in ['textdecode.frag.glsl', 'textdecode2.frag.glsl', 'trainview.frag.glsl', 'textdecode3.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex21.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-
-                    elif shader in ['canyon.frag.glsl', 'planeteclipse.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex22.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex16.png not found for {shader}", xbmc.LOGWARNING)
-
-
-                    elif shader == 'truchetcell.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'envmap.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture envmap.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'flies.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'fly-static.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture fly-static.png not found for {shader}", xbmc.LOGERROR)
-
-                    elif shader == 'kodimac.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'texkodi.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture envmap.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'runner.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'runner.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture runner.png not found, falling back to tex03.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader == 'satphoto.frag.glsl':
-                        texture_path = os.path.join(TEXTURE_PATH, 'satphoto.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex11.png not found for {shader}", xbmc.LOGWARNING)
-
-                    elif shader in ['spaceship.frag.glsl', 'spaceshipdusk.frag.glsl', 'testershader.frag.glsl', 'vhsblues.frag.glsl', 'mountainsunrise.frag.glsl', 'coralcave.frag.glsl', 'spacecity.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex03.png')
-                        if shader == 'vhsblues.frag.glsl':
-                            texture_path = os.path.join(TEXTURE_PATH, 'vhs.png')
-                        if not xbmcvfs.exists(texture_path):
-                            xbmc.log(f"{ADDON_ID}: Texture {texture_path} not found, falling back to tex03a.png", xbmc.LOGWARNING)
-                            texture_path = os.path.join(TEXTURE_PATH, 'tex03a.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture0 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture not found for {shader}", xbmc.LOGWARNING)
-                    else: # Default for texture0 if no specific shader rule matches
-                        setting.text = ''
-
-                # Set texture1 (iChannel1) for specific shaders
-                elif setting.get('id') == 'texture1':
-                    if shader in ['drawerwall.frag.glsl']:
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex23.png')
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture1 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture fly-flying.png not found for {shader}", xbmc.LOGERROR)
-
-                    # MODIFIED SECTION FOR paperlantern.frag.glsl iChannel1
-                    elif shader == 'paperlantern.frag.glsl': # New dual-texture shader
-                        texture_path = os.path.join(TEXTURE_PATH, 'tex08.png') # Correct texture for iChannel1
-                        if xbmcvfs.exists(texture_path):
-                            setting.text = texture_path
-                            xbmc.log(f"{ADDON_ID}: Set texture1 to {texture_path} for {shader}", xbmc.LOGINFO)
-                        else:
-                            setting.text = ''
-                            xbmc.log(f"{ADDON_ID}: Texture tex08.png not found for {shader}", xbmc.LOGWARNING) # Corrected log
-                    # END MODIFIED SECTION FOR paperlantern.frag.glsl iChannel1
-                    else: # Default for texture1 if no specific shader rule matches
-                        setting.text = ''
-
-
-                # Clear other texture slots unless needed for other shaders
-                elif setting.get('id') in ['texture2', 'texture3']:
-                    setting.text = ''
-            tree.write(SETTINGS_PATH)
-            xbmc.log(f"{ADDON_ID}: Updated settings.xml with shader {shader}", xbmc.LOGINFO)
+            textures = bindings.lookup(self.bindings, shader)
+            values = {'shader': self.shader_file(shader), 'ownshader': 'true'}
+            # texture0..3 (iChannel0..3) from the compiled bindings, cleared when unbound
+            values.update(textures)
+            for channel, texture_path in textures.items():
+                if texture_path:
+                    logger.log(f"Set {channel} to {texture_path} for {shader}", xbmc.LOGDEBUG)
+            if self.settings_writer.update(values):
+                self.metrics.inc('settings_writes')
+                logger.log(f"Updated settings.xml with shader {shader}", xbmc.LOGDEBUG)
+            else:
+                self.metrics.inc('settings_unchanged')
+                logger.log(f"settings.xml already set for shader {shader}, not rewritten", xbmc.LOGDEBUG)
         except Exception as e:
-            xbmc.log(f"{ADDON_ID}: Failed to update settings.xml: {str(e)}", xbmc.LOGERROR)
+            self.metrics.inc('settings_errors')
+            logger.log(f"Failed to update settings.xml: {str(e)}", xbmc.LOGERROR, key='settings', every=LOG_REPEAT_INTERVAL)
+        self.metrics.observe('settings_update_ms', (time.monotonic() - started) * 1000)
 
     def set_shader(self, shader):
-        if not xbmcvfs.exists(os.path.join(SHADER_PATH, shader)):
-            xbmc.log(f"{ADDON_ID}: Shader {shader} not found", xbmc.LOGERROR)
+        if shader not in self.shader_index:
+            self.metrics.inc('cycles_skipped_missing')
+            logger.log(f"Shader {shader} not found", xbmc.LOGERROR)
             return
-        xbmc.log(f"{ADDON_ID}: Attempting to set shader to {shader}", xbmc.LOGINFO)
+        logger.log(f"Attempting to set shader to {shader}", xbmc.LOGDEBUG)
         self.update_settings_xml(shader)
-        self.current_shader = shader
-        xbmc.sleep(100) # Give Kodi a moment to process the settings change
+        previous, self.current_shader = self.current_shader, shader
+        if SWITCH_MODE == 0:
+            xbmc.sleep(100) # Give Kodi a moment to process the settings change
         screensaver_active = xbmc.getCondVisibility('System.ScreenSaverActive')
-        xbmc.log(f"{ADDON_ID}: Screensaver active: {screensaver_active}, is_cycling: {self.is_cycling}", xbmc.LOGINFO)
+        logger.log(f"Screensaver active: {screensaver_active}", xbmc.LOGDEBUG)
         if screensaver_active:
-            self.is_cycling = True # Set flag to prevent re-triggering cycle on reactivation
-            self.is_refreshing = True # Indicate that this is a programmatic refresh
-            xbmc.executebuiltin('DeactivateScreensaver')
-            xbmc.sleep(2000) # Give it time to deactivate
-            xbmc.executebuiltin('ActivateScreensaver')
-            xbmc.log(f"{ADDON_ID}: Refreshed screensaver for {shader}", xbmc.LOGINFO)
-            self.is_refreshing = False
-            self.is_cycling = False # Reset flag after cycling attempt
+            with self.state_lock:
+                go = not self.switch_cancelled.is_set()
+                if go:
+                    self.switch_phase = 'deactivating' # The next deactivation is ours
+                    # ...even when it arrives after SWITCH_TIMEOUT and the phase has moved on
+                    self.own_deactivation_until = time.monotonic() + SWITCH_TIMEOUT + LATE_CALLBACK_GRACE
+                    self.deactivated_event.clear()
+                    self.activated_event.clear()
+            if not go:
+                self.cancel_switch(shader)
+                return
+            overlay = self.show_overlay(previous, shader) # Under the screensaver until it goes down
+            try:
+                started = time.monotonic()
+                xbmc.executebuiltin('DeactivateScreensaver')
+                if SWITCH_MODE == 1:
+                    # Reactivate as soon as Kodi reports the screensaver gone, the timeout is only a safety net
+                    if not self.deactivated_event.wait(SWITCH_TIMEOUT) and not self.switch_cancelled.is_set():
+                        self.metrics.inc('switch_deactivation_timeouts')
+                        logger.log(f"No deactivation event within {SWITCH_TIMEOUT}s, reactivating anyway", xbmc.LOGWARNING)
+                else:
+                    self.switch_cancelled.wait(2) # Old fixed pause to let it deactivate, cut short by a cancel
+                deactivated = time.monotonic()
+                with self.state_lock:
+                    # A real deactivation in the meantime means someone is using Kodi: do not bring the screensaver back
+                    go = not self.switch_cancelled.is_set()
+                    self.switch_phase = 'activating' if go else None
+                if not go:
+                    self.cancel_switch(shader)
+                    return
+                xbmc.executebuiltin('ActivateScreensaver')
+                # Stay in 'activating' until our own activation has come through onScreensaverActivated
+                seen = self.activated_event.wait(SWITCH_TIMEOUT)
+                gap_ms = (time.monotonic() - started) * 1000
+                self.metrics.observe('switch_gap_ms', gap_ms)
+                self.metrics.observe('switch_deactivation_ms', (deactivated - started) * 1000)
+                self.metrics.inc('switches')
+                if not seen:
+                    self.metrics.inc('switch_activation_timeouts')
+                logger.log(f"Refreshed screensaver for {shader}", xbmc.LOGINFO)
+                logger.log(f"Switch gap {gap_ms:.0f} ms (deactivation {(deactivated - started) * 1000:.0f} ms{'' if seen else ', activation not seen'})", xbmc.LOGDEBUG)
+                with self.state_lock:
+                    self.switch_phase = None
+                self.shader_shown_at = time.monotonic()
+                if overlay and seen:
+                    self.switch_cancelled.wait(PREVIEW_HOLD_MS / 1000) # First frames of the new shader, a cancel cuts it short
+            finally:
+                if overlay:
+                    overlay.close()
         else:
-            xbmc.log(f"{ADDON_ID}: Skipping refresh, screensaver not active", xbmc.LOGINFO)
+            self.metrics.inc('cycles_skipped_inactive')
+            logger.log("Skipping refresh, screensaver not active", xbmc.LOGINFO)
+
+    def show_overlay(self, outgoing, incoming):
+        # Fullscreen crossfade between the two previews for the length of the switch, None if there is nothing to show
+        if PREVIEW_OVERLAY != 1 or SetToTester == 1:
+            return None
+        overlay = preview_overlay.Overlay(PREVIEW_FADE_MS)
+        try:
+            if not overlay.show(self.previews.path(outgoing), self.previews.path(incoming)):
+                return None
+        except Exception as e:
+            logger.log(f"Preview overlay failed: {str(e)}", xbmc.LOGWARNING, key='overlay', every=LOG_REPEAT_INTERVAL)
+            return None
+        self.metrics.inc('preview_overlays')
+        return overlay
+
+    def cancel_switch(self, shader):
+        self.metrics.inc('switches_cancelled')
+        logger.log(f"Switch to {shader} cancelled, screensaver deactivated", xbmc.LOGINFO)
 
     def cycle_shaders(self):
         if not self.all_shaders:
-            xbmc.log(f"{ADDON_ID}: No shaders to cycle in the master list", xbmc.LOGERROR)
+            self.metrics.inc('cycles_skipped_empty')
+            logger.log("No shaders to cycle in the master list", xbmc.LOGERROR)
             return
-        if self.is_cycling:
-            xbmc.log(f"{ADDON_ID}: Already cycling, skipping", xbmc.LOGINFO)
+        if not self.switch_lock.acquire(blocking=False):
+            self.metrics.inc('cycles_skipped_busy')
+            logger.log("Already cycling, skipping", xbmc.LOGINFO)
             return
+        try:
+            self.metrics.inc('cycles')
+            self.cycle_locked()
+        finally:
+            self.switch_lock.release()
 
-        self.is_cycling = True # Set flag to indicate a cycle is in progress
-
+    def cycle_locked(self):
         if SetToTester == 1:
             next_shader = TESTER_SHADER
-            xbmc.log(f"{ADDON_ID}: SetToTester enabled, using {next_shader}", xbmc.LOGINFO)
+            logger.log(f"SetToTester enabled, using {next_shader}", xbmc.LOGINFO)
+        elif self.active_playlist() is self.eco_playlist:
+            # Cheap shaders only; the main batch and rotation.txt stay where they were
+            next_shader = self.eco_playlist.next()
+            self.metrics.inc('eco_switches')
+            self.save_cost_table()
+            logger.log(f"Eco mode: cycling to {next_shader}", xbmc.LOGINFO)
         else:
-            # If the current batch of shaders is exhausted, reshuffle the master list
-            # and start a new batch.
-            if not self.remaining_shaders:
-                xbmc.log(f"{ADDON_ID}: All shaders in current batch cycled. Reshuffling for a new batch.", xbmc.LOGINFO)
-                random.shuffle(self.all_shaders) # Reshuffle the master list
-                self.remaining_shaders = list(self.all_shaders) # Populate with a new copy
-
-            next_shader = self.remaining_shaders.pop(0) # Get the next shader from the batch
-
-            # Optional: Ensure the next_shader is not the same as the current_shader
-            # This handles cases where the pop(0) gives you the same shader that was just active.
-            # It also makes sure there's more than one shader left to pick from to avoid an infinite loop
-            # if only one shader remains and it happens to be the current one.
-            if next_shader == self.current_shader and len(self.remaining_shaders) > 0:
-                xbmc.log(f"{ADDON_ID}: Next shader from batch ({next_shader}) is same as current. Re-adding to end and picking again.", xbmc.LOGINFO)
-                self.remaining_shaders.append(next_shader) # Put it back to ensure it gets seen later
-                # We can reshuffle the remaining list to ensure the next pick is truly random
-                # among the remaining, or just let it naturally cycle. Shuffling is safer.
-                random.shuffle(self.remaining_shaders)
-                next_shader = self.remaining_shaders.pop(0)
-
-
-            xbmc.log(f"{ADDON_ID}: Cycling to {next_shader}. {len(self.remaining_shaders)} shaders remaining in current batch.", xbmc.LOGINFO)
+            # A new batch is drawn automatically when the current one is used up, and the
+            # repeat distance keeps the current shader (and the last few) from coming straight back
+            batch = self.playlist.picked_batch
+            next_shader = self.playlist.next()
+            if self.playlist.picked_batch != batch and batch:
+                self.metrics.inc('batches')
+                logger.log("All shaders in current batch cycled. Reshuffling for a new batch.", xbmc.LOGINFO)
+            try:
+                self.rotation_log.record(next_shader, self.playlist.picked_batch) # One appended line per switch
+            except Exception as e:
+                logger.log(f"Failed to save rotation state: {str(e)}", xbmc.LOGERROR, key='rotation', every=LOG_REPEAT_INTERVAL)
+
+            self.save_cost_table() # Once per shader window rather than per sample
+            logger.log(f"Cycling to {next_shader}. {self.playlist.remaining()} shaders remaining in current batch.", xbmc.LOGINFO)
 
         self.set_shader(next_shader)
-        self.is_cycling = False # Reset flag after cycling attempt
+        if SetToTester == 0 and PREFETCH_BUDGET_MB:
+            self.prefetch_next()
+        if SetToTester == 0 and PREVIEW_OVERLAY == 1:
+            # Small copies for the next switch: this shader's image goes out, the upcoming one's comes in
+            self.previews.request([next_shader, self.active_playlist().peek()])
+
+    def prefetch_next(self):
+        # Fix the next pick now and get its files off SD/eMMC while the current shader runs,
+        # instead of cold reads during the next switch gap
+        upcoming = self.active_playlist().peek()
+        if upcoming:
+            paths = [self.shader_file(upcoming)]
+            paths.extend(path for path in bindings.lookup(self.bindings, upcoming).values() if path)
+            self.prefetcher.request(paths)
+
+    def active_playlist(self):
+        # With no shader in ECO_TIERS eco mode only lengthens the interval
+        if self.power.mode == power_policy.ECO and len(self.eco_playlist):
+            return self.eco_playlist
+        return self.playlist
+
+    def update_power_mode(self):
+        # Eco mode by idle time, ECO_HOURS or SoC temperature, evaluated once per cycle
+        if POWER_POLICY != 1 or SetToTester == 1:
+            return
+        temperature = power_policy.read_temperature(THERMAL_PATH) if THERMAL_HOT_C else None
+        if temperature is not None:
+            self.metrics.set('soc_temperature_c', round(temperature, 1))
+        previous = self.power.mode
+        mode, reason = self.power.update(time.monotonic() - self.activated_at, time.localtime().tm_hour, temperature)
+        if mode == previous:
+            return
+        self.metrics.set('eco_mode', 1 if mode == power_policy.ECO else 0)
+        if mode == power_policy.ECO:
+            self.metrics.inc('eco_entries')
+            logger.log(f"Power mode eco ({reason}): {len(self.eco_playlist)} cheap shaders, {ECO_CYCLE_INTERVAL}s each", xbmc.LOGINFO)
+        else:
+            logger.log(f"Power mode normal: {len(self.playlist)} shaders, {CYCLE_INTERVAL}s each", xbmc.LOGINFO)
+
+    def on_prefetch_done(self, paths, result):
+        if isinstance(result, Exception):
+            logger.log(f"Prefetch of {os.path.basename(paths[0])} failed: {str(result)}", xbmc.LOGWARNING)
+        else:
+            logger.log(f"Prefetched {os.path.basename(paths[0])} ({result // 1024} KB)", xbmc.LOGDEBUG)
+
+    def on_timer_error(self, name, e):
+        # Exceptions escaping a timer callback, on the scheduler thread; the periodic ones re-arm in a finally
+        self.metrics.inc('timer_errors')
+        logger.log(f"Timer {name} failed: {str(e)}", xbmc.LOGERROR, key=f'timer-{name}', every=LOG_REPEAT_INTERVAL)
+
+    def start_timers(self):
+        # Only called on a real activation; cancel_all() in onScreensaverDeactivated stops them again.
+        # The first shader is set right away on the scheduler thread, not inside the Monitor callback,
+        # because set_shader waits for Kodi's deactivate/activate callbacks. Timers are named, so a
+        # burst of activations or cycle requests still leaves at most one switch pending.
+        # Loading the library and applying library changes go first, so the first pick already sees them.
+        if not self.library_loaded:
+            self.scheduler.schedule('load', 0, self.load_library)
+        if self.pending_changes:
+            self.scheduler.schedule('reload', 0, self.on_reload_timer) # Cut short by the last deactivation
+        if self.watcher and not self.inotify:
+            self.scheduler.schedule('watch', 0, self.on_watch_timer)
+        self.scheduler.schedule('cycle', 0, self.on_cycle_timer)
+        self.scheduler.schedule('status', LOG_INTERVAL, self.on_status_timer)
+        if PROFILE_FPS == 1:
+            self.scheduler.schedule('fps', FPS_SAMPLE_INTERVAL, self.on_fps_timer)
+        if METRICS_INTERVAL:
+            self.scheduler.schedule('metrics', METRICS_INTERVAL, self.on_metrics_timer)
+        if self.log_follower:
+            self.log_follower.skip_to_end() # Only errors from this screensaver session
+            self.scheduler.schedule('logtail', LOG_FOLLOW_INTERVAL, self.on_log_timer)
+
+    def rearm(self, name, delay, callback):
+        # Timers re-arm themselves on the scheduler thread; checking and scheduling under state_lock
+        # keeps a deactivation in between from leaving one behind after cancel_all()
+        with self.state_lock:
+            if self.screensaver_started:
+                self.scheduler.schedule(name, delay, callback)
+
+    def on_cycle_timer(self):
+        # A failed switch (settings.xml, overlay, playlist) is logged by on_timer_error and must
+        # not end the rotation: the next cycle is armed whatever happens
+        try:
+            self.update_power_mode()
+            if xbmc.getCondVisibility('System.ScreenSaverActive'):
+                self.cycle_shaders()
+            else:
+                self.metrics.inc('cycles_skipped_inactive')
+        finally:
+            if SetToTester == 0:
+                self.rearm('cycle', ECO_CYCLE_INTERVAL if self.power.mode == power_policy.ECO else CYCLE_INTERVAL, self.on_cycle_timer)
+
+    def on_status_timer(self):
+        try:
+            logger.log(f"Service Running. Current shader: {self.current_shader}. Shaders in batch: {self.playlist.remaining()}", xbmc.LOGINFO, key='status', every=STATUS_LOG_INTERVAL)
+        finally:
+            self.rearm('status', LOG_INTERVAL, self.on_status_timer)
+
+    def on_fps_timer(self):
+        try:
+            shader = self.current_shader
+            if shader and self.switch_phase is None and time.monotonic() - self.shader_shown_at >= FPS_WARMUP:
+                try:
+                    fps = float(xbmc.getInfoLabel('System.FPS'))
+                except ValueError:
+                    fps = 0
+                if fps > 0:
+                    self.cost_table.record(shader, fps)
+                    self.metrics.observe('fps', fps, FPS_BUCKETS)
+                    if len(self.playlist) > 1 and shader in self.playlist and self.cost_table.too_slow(shader, FPS_FLOOR, FPS_MIN_SAMPLES):
+                        n, mean, low, frame_ms = self.cost_table.stats(shader)
+                        logger.log(f"{shader} averages {mean:.1f} FPS ({frame_ms:.1f} ms/frame) over {n} samples, below {FPS_FLOOR}. Removing from rotation", xbmc.LOGWARNING)
+                        self.all_shaders.remove(shader)
+                        self.playlist.remove(shader)
+                        self.eco_playlist.remove(shader)
+        finally:
+            self.rearm('fps', FPS_SAMPLE_INTERVAL, self.on_fps_timer)
+
+    def on_log_timer(self):
+        try:
+            errors = log_follower.shader_errors(self.log_follower.read_lines(), f'{ADDON_ID}: ')
+            named = any(name for name, line in errors) # GL detail lines come with the named one, not as a second failure
+            for name, line in errors:
+                if name:
+                    # The screensaver may have been pointed at the minified copy
+                    shader = next((shader for shader, path in self.minified.items() if os.path.basename(path) == name), name)
+                elif not named and time.monotonic() - self.shader_shown_at < FAILURE_WINDOW:
+                    shader = self.current_shader
+                else:
+                    continue
+                self.quarantine_shader(shader, line)
+        finally:
+            self.rearm('logtail', LOG_FOLLOW_INTERVAL, self.on_log_timer)
+
+    def quarantine_shader(self, shader, line):
+        if shader in self.quarantine or shader not in self.shader_index:
+            return
+        try:
+            # Hash the file as it is now, the index may predate an edit that has not been reloaded yet
+            self.quarantine.add(shader, shader_index.hash_file(os.path.join(SHADER_PATH, shader)), line.strip()[-300:])
+        except Exception as e:
+            logger.log(f"Failed to save {QUARANTINE_PATH}: {str(e)}", xbmc.LOGERROR)
+        self.metrics.inc('quarantined')
+        self.metrics.set('shaders_quarantined', len(self.quarantine))
+        logger.log(f"Quarantined {shader}, the screensaver could not use it: {line.strip()}", xbmc.LOGWARNING)
+        if len(self.playlist) > 1 and shader in self.playlist:
+            self.all_shaders.remove(shader)
+            self.playlist.remove(shader)
+            self.eco_playlist.remove(shader)
+        if shader == self.current_shader and self.switch_phase is None:
+            # Black screen until the next cycle otherwise; swap it out right away
+            self.metrics.inc('cycles_recovered')
+            self.rearm('cycle', 0, self.on_cycle_timer)
+
+    def on_metrics_timer(self):
+        try:
+            self.save_metrics()
+        finally:
+            self.rearm('metrics', METRICS_INTERVAL, self.on_metrics_timer)
+
+    def save_metrics(self):
+        try:
+            self.metrics.save(METRICS_PATH)
+        except Exception as e:
+            logger.log(f"Failed to save {METRICS_PATH}: {str(e)}", xbmc.LOGERROR)
+
+    def start_metrics_server(self):
+        try:
+            self.metrics_server = metrics.MetricsServer(self.metrics, METRICS_PORT)
+            self.metrics_server.start()
+            logger.log(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/", xbmc.LOGINFO)
+        except Exception as e:
+            self.metrics_server = None
+            logger.log(f"Failed to serve metrics on port {METRICS_PORT}: {str(e)}", xbmc.LOGERROR)
+
+    def save_cost_table(self):
+        try:
+            self.cost_table.save()
+        except Exception as e:
+            logger.log(f"Failed to save {COST_TABLE_PATH}: {str(e)}", xbmc.LOGERROR)
+
+    def onNotification(self, sender, method, data):
+        # kodi-send --action="NotifyAll(service.shadertoy.cycler,dumplog)" writes the ring buffer to LOG_DUMP_PATH
+        if sender == ADDON_ID and method.endswith('dumplog'):
+            try:
+                count = logger.dump(LOG_DUMP_PATH, LOG_LEVEL_NAMES)
+                logger.log(f"Dumped {count} recent log messages to {LOG_DUMP_PATH}", xbmc.LOGINFO)
+            except Exception as e:
+                logger.log(f"Failed to dump log to {LOG_DUMP_PATH}: {str(e)}", xbmc.LOGERROR)
+
+    def on_deactivated_timer(self):
+        # File writes of a real deactivation, kept off the Monitor callback
+        self.save_cost_table()
+        self.save_metrics()
 
     def onScreensaverActivated(self):
-        xbmc.log(f"{ADDON_ID}: Screensaver activated", xbmc.LOGINFO)
-        if self.is_refreshing:
-            xbmc.log(f"{ADDON_ID}: Ignoring activation due to refresh by cycler", xbmc.LOGINFO)
+        with self.state_lock:
+            ours = self.switch_phase == 'activating'
+            if ours:
+                self.activated_event.set()
+            else:
+                self.switch_cancelled.clear()
+                first = not self.screensaver_started
+                if first:
+                    self.screensaver_started = True
+                    self.activated_at = time.monotonic() # Idle time for the power policy counts from here
+                    self.start_timers()
+        if ours:
+            logger.log("Ignoring activation due to refresh by cycler", xbmc.LOGDEBUG)
             return
-        if not self.screensaver_started:
-            xbmc.log(f"{ADDON_ID}: First screensaver activation (not a refresh), starting cycle", xbmc.LOGINFO)
-            self.screensaver_started = True
-            self.cycle_shaders()
-            self.last_cycle = time.time() # Update last_cycle after first shader is set
+        logger.log("Screensaver activated", xbmc.LOGINFO)
+        if first:
+            logger.log("First screensaver activation (not a refresh), starting cycle", xbmc.LOGINFO)
 
     def onScreensaverDeactivated(self):
-        xbmc.log(f"{ADDON_ID}: Screensaver deactivated", xbmc.LOGINFO)
-        self.screensaver_started = False
-        self.is_cycling = False # Ensure cycling flag is reset on deactivation
+        with self.state_lock:
+            ours = time.monotonic() < self.own_deactivation_until
+            if ours:
+                # Our own DeactivateScreensaver inside set_shader, keep the timers running. Only this
+                # callback clears the deadline: a late one must not look like someone waking Kodi up.
+                self.own_deactivation_until = 0
+                if self.switch_phase == 'deactivating':
+                    self.switch_phase = 'deactivated'
+                self.deactivated_event.set()
+            else:
+                # Someone woke Kodi up: stop everything and cut a running switch short
+                self.switch_cancelled.set()
+                self.deactivated_event.set()
+                self.activated_event.set()
+                self.screensaver_started = False
+                self.scheduler.cancel_all() # Nothing to do until the next activation
+                self.scheduler.schedule('deactivated', 0, self.on_deactivated_timer)
+                if not self.library_loaded:
+                    self.scheduler.schedule('load', LAZY_START_DELAY, self.load_library) # Back to the boot-time plan
+        if ours:
+            logger.log("Ignoring deactivation due to refresh by cycler", xbmc.LOGDEBUG)
+            return
+        logger.log("Screensaver deactivated", xbmc.LOGINFO)
 
 if __name__ == '__main__':
-    xbmc.log(f"{ADDON_ID}: Starting shader cycler service", xbmc.LOGINFO)
+    logger.log("Starting shader cycler service", xbmc.LOGINFO)
     monitor = ShaderCycler()
-    last_log = time.time()
-    while not monitor.abortRequested():
-        current_time = time.time()
-        # Log status periodically
-        if current_time - last_log >= LOG_INTERVAL:
-            xbmc.log(f"{ADDON_ID}: Service Running. Current shader: {monitor.current_shader}. Shaders in batch: {len(monitor.remaining_shaders)}", xbmc.LOGINFO)
-            last_log = current_time
-
-        # Only cycle if not in tester mode and interval passed and screensaver is active
-        if SetToTester == 0 and current_time - monitor.last_cycle >= CYCLE_INTERVAL:
-            if xbmc.getCondVisibility('System.ScreenSaverActive'):
-                monitor.cycle_shaders()
-                monitor.last_cycle = current_time # Reset the timer only after a successful cycle
-
-        monitor.waitForAbort(1) # Wait for 1 second, allowing Kodi to signal abortion
-    xbmc.log(f"{ADDON_ID}: Stopping shader cycler service", xbmc.LOGINFO)
\ No newline at end of file
+    monitor.scheduler.start()
+    if METRICS_PORT:
+        monitor.start_metrics_server()
+    if xbmc.getCondVisibility('System.ScreenSaverActive'):
+        monitor.onScreensaverActivated() # Service (re)started while the screensaver is already up
+    # Sleep until Kodi shuts down; cycling and status logging run on the scheduler thread
+    monitor.waitForAbort()
+    monitor.scheduler.stop(5)
+    if monitor.watcher:
+        monitor.watcher.stop()
+    monitor.save_metrics()
+    if monitor.metrics_server:
+        monitor.metrics_server.stop()
+    logger.log("Stopping shader cycler service", xbmc.LOGINFO)
@@ -0,0 +1,69 @@
+import collections
+import threading
+import time
+
+import atomicfile
+
+
+class Logger:
+    # Thin layer in front of xbmc.log (passed in as 'sink'), to keep kodi.log small
+    # on SD-card boxes without losing detail:
+    #   - messages below 'level' are not written, but still land in the ring buffer
+    #   - a message identical to the previous one is counted instead of written
+    #   - log(..., key=k, every=s) writes at most one message per key every s seconds
+    # Suppressed counts are appended to the next message that does get written.
+    # Levels are Kodi's (xbmc.LOGDEBUG < LOGINFO < LOGWARNING < LOGERROR).
+    def __init__(self, sink, prefix, level, ring_size=500, clock=time.monotonic):
+        self.sink = sink
+        self.prefix = prefix
+        self.level = level
+        self.clock = clock
+        self.ring = collections.deque(maxlen=ring_size) # (wall time, level, message), newest last
+        self.written = 0
+        self.suppressed = 0
+        self._last = None # (level, message) last written
+        self._repeats = 0 # Times _last came again without being written
+        self._keys = {} # key -> [monotonic time last written, suppressed since]
+        self._lock = threading.Lock()
+
+    def log(self, message, level, key=None, every=None):
+        with self._lock:
+            self.ring.append((time.time(), level, message))
+            if level < self.level:
+                return
+            if (level, message) == self._last:
+                self._repeats += 1
+                self.suppressed += 1
+                return
+            if key is not None and every:
+                # Before the repeat count below is flushed: a suppressed message writes nothing, so
+                # the count stays pending for the next message that does get written
+                now = self.clock()
+                slot = self._keys.get(key)
+                if slot and now - slot[0] < every:
+                    slot[1] += 1
+                    self.suppressed += 1
+                    return
+                if slot and slot[1]:
+                    message = f"{message} ({slot[1]} similar suppressed)"
+                self._keys[key] = [now, 0]
+            lines = []
+            if self._repeats:
+                lines.append((self._last[0], f"{self.prefix}: Last message repeated {self._repeats} more times"))
+                self._repeats = 0
+            self._last = (level, message)
+            lines.append((level, f"{self.prefix}: {message}"))
+            self.written += len(lines)
+        for line_level, line in lines:
+            self.sink(line, line_level)
+
+    def dump(self, path, level_names=None):
+        # Write the ring buffer to 'path', oldest first; returns the number of lines
+        with self._lock:
+            entries = list(self.ring)
+        lines = []
+        for stamp, level, message in entries:
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stamp)) + f'.{int(stamp * 1000) % 1000:03d}'
+            lines.append(f"{when} {(level_names or {}).get(level, level)} {message}")
+        atomicfile.write_bytes(path, ('\n'.join(lines) + '\n').encode('utf-8'))
+        return len(lines)
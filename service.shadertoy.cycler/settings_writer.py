@@ -0,0 +1,57 @@
+import os
+
+import atomicfile
+
+
+class SettingsWriter:
+    # Keeps screensaver.shadertoy's settings.xml parsed in memory and only touches
+    # the <setting> elements listed in 'ids'. The file is parsed again only when
+    # its mtime/size changed behind our back (e.g. the user edited the addon
+    # settings in Kodi), and writes go to a temp file that is renamed over the
+    # original so Kodi never reads a half-written file.
+    def __init__(self, path, ids):
+        self.path = path
+        self.ids = tuple(ids)
+        self.tree = None
+        self.elements = {}
+        self.stamp = None
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        import xml.etree.ElementTree as ET # Imported on the first switch, not at Kodi boot
+
+        stamp = self._stat()
+        self.tree = ET.parse(self.path)
+        self.elements = {}
+        for setting in self.tree.getroot().findall('setting'):
+            if setting.get('id') in self.ids:
+                self.elements[setting.get('id')] = setting
+        self.stamp = stamp
+
+    def _write(self):
+        import xml.etree.ElementTree as ET
+
+        atomicfile.write_bytes(self.path, ET.tostring(self.tree.getroot()))
+        self.stamp = self._stat()
+
+    def update(self, values):
+        # Apply {setting id: text} and write the file if anything changed.
+        # Ids missing from settings.xml are ignored, as before. Returns True if written.
+        if self.tree is None or self._stat() != self.stamp:
+            self._load()
+        changed = False
+        for setting_id, text in values.items():
+            element = self.elements.get(setting_id)
+            if element is not None and (element.text or '') != text:
+                element.text = text
+                changed = True
+        if changed:
+            try:
+                self._write()
+            except Exception:
+                self.tree = None # Memory no longer matches disk, parse again next time
+                raise
+        return changed
@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+import atomicfile
+
+SHADER_SUFFIX = '.frag.glsl'
+CACHE_VERSION = 1
+
+
+def hash_file(path):
+    # What the index keeps as 'hash'
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan(shader_dir, previous=None):
+    # One directory listing of shader_dir -> {name: {'size', 'mtime', 'hash'}}.
+    # Files whose size and mtime match 'previous' keep their hash without being read.
+    previous = previous or {}
+    entries = {}
+    with os.scandir(shader_dir) as it:
+        for entry in it:
+            if not entry.name.endswith(SHADER_SUFFIX) or not entry.is_file():
+                continue
+            st = entry.stat()
+            old = previous.get(entry.name)
+            if old and old['size'] == st.st_size and old['mtime'] == st.st_mtime_ns:
+                digest = old['hash']
+            else:
+                digest = hash_file(entry.path)
+            entries[entry.name] = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'hash': digest}
+    return entries
+
+
+def load(shader_dir, cache_path):
+    # Return (entries, rebuilt). Every cached entry is revalidated by its own size and
+    # mtime (one stat per shader, no reads): saving a shader in place does not touch the
+    # directory mtime, so that alone cannot tell whether a hash is still right.
+    cache = atomicfile.read_json(cache_path, {})
+    previous = cache.get('shaders') if cache.get('version') == CACHE_VERSION and cache.get('dir') == shader_dir else None
+    entries = scan(shader_dir, previous)
+    if entries == previous:
+        return entries, False
+    atomicfile.write_json(cache_path, {'version': CACHE_VERSION, 'dir': shader_dir, 'shaders': entries})
+    return entries, True
+
+
+def refresh(shader_dir, cache_path, previous):
+    # Rescan after a change was seen, hashing only new or touched files, and update the cache
+    entries = scan(shader_dir, previous)
+    atomicfile.write_json(cache_path, {'version': CACHE_VERSION, 'dir': shader_dir, 'shaders': entries})
+    return entries
+
+
+def select(entries, allow=None, deny=()):
+    # Names from the index that may be cycled, in sorted order. 'allow' (e.g.
+    # FIXED_SHADERS) restricts the set when given; names in 'deny' and work files
+    # starting with '-' (code snippets, -ORIGINAL copies) are always left out.
+    # Also returns the allowed names that are not on disk.
+    deny = set(deny)
+    if allow is None:
+        names = sorted(entries)
+        missing = []
+    else:
+        allow = list(dict.fromkeys(allow)) # Drop duplicates, keep order
+        names = sorted(name for name in allow if name in entries)
+        missing = [name for name in allow if name not in entries]
+    return [name for name in names if name not in deny and not name.startswith('-')], missing
@@ -0,0 +1,89 @@
+import os
+import re
+import struct
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers carry the image size (C4, C8 and CC are not SOF)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def image_size(path):
+    # (width, height) from the PNG or JPEG header without decoding, None if unknown
+    with open(path, 'rb') as f:
+        head = f.read(26)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if not head.startswith(b'\xff\xd8'):
+            return None
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] == 0xFF:
+                f.seek(-1, os.SEEK_CUR) # Fill byte
+                continue
+            length = struct.unpack('>H', f.read(2))[0]
+            if marker[1] in JPEG_SOF_MARKERS:
+                height, width = struct.unpack('>xHH', f.read(5))
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def variant_path(src_path, cache_dir, max_size, image_format):
+    # Name changes with the source mtime, so an edited texture gets a fresh variant
+    st = os.stat(src_path)
+    return os.path.join(cache_dir, f'{os.path.basename(src_path)}-{max_size}-{st.st_mtime_ns:x}.{image_format}')
+
+
+def prune_variants(src_path, keep_path):
+    # Delete the other variants of src_path next to keep_path: older mtimes, other sizes or formats
+    cache_dir = os.path.dirname(keep_path)
+    pattern = re.compile(re.escape(os.path.basename(src_path)) + r'-\d+-[0-9a-f]+\.\w+')
+    for name in os.listdir(cache_dir):
+        if pattern.fullmatch(name) and name != os.path.basename(keep_path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+
+def prepare(src_path, cache_dir, max_size, image_format='png'):
+    # Path to use for src_path on this box: the original when it already fits in
+    # max_size (or no cap is set), otherwise a downscaled copy in cache_dir.
+    # Raises when a variant is needed but cannot be made (e.g. no Pillow).
+    size = image_size(src_path)
+    if not max_size or size is None or max(size) <= max_size:
+        return src_path
+    dst_path = variant_path(src_path, cache_dir, max_size, image_format)
+    if os.path.exists(dst_path):
+        return dst_path
+    try:
+        from PIL import Image # Kodi: script.module.pil, not installed everywhere; imported on first use
+    except ImportError:
+        raise RuntimeError('Pillow is not available')
+    with Image.open(src_path) as img:
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image_format == 'jpg':
+            img = img.convert('RGB')
+        tmp_path = dst_path + '.tmp'
+        img.save(tmp_path, 'JPEG' if image_format == 'jpg' else 'PNG', optimize=True, quality=90)
+    os.replace(tmp_path, dst_path)
+    prune_variants(src_path, dst_path) # The one left behind by the previous edit, each is up to full size
+    return dst_path
+
+
+def prepare_all(paths, cache_dir, max_size, image_format='png'):
+    # ({original: variant} for every texture that got a variant, {original: error})
+    variants, errors = {}, {}
+    os.makedirs(cache_dir, exist_ok=True)
+    for src_path in sorted(set(paths)):
+        try:
+            dst_path = prepare(src_path, cache_dir, max_size, image_format)
+        except Exception as e:
+            errors[src_path] = str(e)
+            continue
+        if dst_path != src_path:
+            variants[src_path] = dst_path
+    return variants, errors
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'service.shadertoy.cycler'))
+
+import bindings
+
+TEXTURE_DIR = os.path.join('addon', 'resources')
+
+
+def path(name):
+    return os.path.join(TEXTURE_DIR, name)
+
+
+class CompileBindingsTest(unittest.TestCase):
+    def compile(self, rules, available):
+        return bindings.compile_bindings({'rules': rules}, TEXTURE_DIR, set(available))
+
+    def test_first_rule_wins_per_channel(self):
+        table, problems = self.compile([
+            {'shaders': ['a.frag.glsl'], 'texture0': 'tex01.png'},
+            {'shaders': ['a.frag.glsl', 'b.frag.glsl'], 'texture0': 'tex02.png', 'texture1': 'tex03.png'},
+        ], ['tex01.png', 'tex02.png', 'tex03.png'])
+        self.assertEqual(problems, [])
+        # The later rule still fills a channel the first one left alone
+        self.assertEqual(table['a.frag.glsl'], dict(bindings.EMPTY_BINDING, texture0=path('tex01.png'), texture1=path('tex03.png')))
+        self.assertEqual(table['b.frag.glsl'], dict(bindings.EMPTY_BINDING, texture0=path('tex02.png'), texture1=path('tex03.png')))
+
+    def test_fallback_chain_takes_the_first_available(self):
+        table, problems = self.compile([
+            {'shaders': ['a.frag.glsl'], 'texture0': ['tex03a.png', 'tex03b.png', 'tex03.png']},
+        ], ['tex03.png', 'tex03b.png'])
+        self.assertEqual(bindings.lookup(table, 'a.frag.glsl')['texture0'], path('tex03b.png'))
+        self.assertEqual(len(problems), 1)
+        self.assertIn('falling back to tex03b.png', problems[0])
+
+    def test_missing_chain_clears_the_channel(self):
+        table, problems = self.compile([
+            {'shaders': ['a.frag.glsl'], 'texture0': ['gone.png', 'also_gone.png'], 'texture1': 'tex01.png'},
+        ], ['tex01.png'])
+        self.assertEqual(table['a.frag.glsl']['texture0'], '')
+        self.assertEqual(table['a.frag.glsl']['texture1'], path('tex01.png'))
+        self.assertIn('No texture', problems[0])
+
+    def test_unbound_shader_gets_every_channel_cleared(self):
+        table, problems = self.compile([{'shaders': ['a.frag.glsl'], 'texture0': 'tex01.png'}], ['tex01.png'])
+        self.assertEqual(bindings.lookup(table, 'other.frag.glsl'), bindings.EMPTY_BINDING)
+
+    def test_remap_swaps_paths_and_keeps_the_rest(self):
+        table, problems = self.compile([
+            {'shaders': ['a.frag.glsl'], 'texture0': 'big.png', 'texture1': 'small.png'},
+        ], ['big.png', 'small.png'])
+        remapped = bindings.remap(table, {path('big.png'): 'cache/big-512.png'})
+        self.assertEqual(remapped['a.frag.glsl']['texture0'], 'cache/big-512.png')
+        self.assertEqual(remapped['a.frag.glsl']['texture1'], path('small.png'))
+        self.assertEqual(bindings.texture_paths(remapped), {'cache/big-512.png', path('small.png')})
+
+
+if __name__ == '__main__':
+    unittest.main()
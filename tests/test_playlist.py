@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'service.shadertoy.cycler'))
+
+import playlist
+
+
+def picks(rotation, n):
+    return [rotation.next() for _ in range(n)]
+
+
+class DrawTest(unittest.TestCase):
+    def test_same_seed_same_order(self):
+        shaders = [f's{i}' for i in range(50)]
+        first = playlist.Playlist(shaders, {'s1': 2, 's2': 0.5}, min_distance=5, seed=42)
+        second = playlist.Playlist(shaders, {'s1': 2, 's2': 0.5}, min_distance=5, seed=42)
+        self.assertEqual(picks(first, 300), picks(second, 300))
+        other = playlist.Playlist(shaders, {'s1': 2, 's2': 0.5}, min_distance=5, seed=43)
+        self.assertNotEqual(picks(playlist.Playlist(shaders, min_distance=5, seed=42), 50), picks(other, 50))
+
+    def test_every_shader_once_per_batch(self):
+        shaders = [f's{i}' for i in range(30)]
+        rotation = playlist.Playlist(shaders, min_distance=10, seed=1)
+        for _ in range(4):
+            self.assertEqual(sorted(picks(rotation, 30)), sorted(shaders))
+
+    def test_weights_set_copies_per_batch(self):
+        rotation = playlist.Playlist(['a', 'b', 'c', 'd', 'e', 'f'], {'a': 3, 'b': 0}, min_distance=1, seed=3)
+        batch = picks(rotation, 7) # 3 + 0 + 4 * 1
+        self.assertEqual(batch.count('a'), 3)
+        self.assertNotIn('b', batch)
+        self.assertEqual(rotation.remaining(), 0)
+
+    def test_min_distance_holds_across_batches(self):
+        rotation = playlist.Playlist([f's{i}' for i in range(20)], min_distance=8, seed=7)
+        order = picks(rotation, 200)
+        for i, name in enumerate(order):
+            self.assertNotIn(name, order[max(i - 8, 0):i])
+
+    def test_small_library_is_not_a_fixed_loop(self):
+        # Fewer shaders than min_distance: the distance shrinks to half the library
+        rotation = playlist.Playlist(list('abcde'), min_distance=100, seed=5)
+        self.assertEqual(rotation.distance(), 2)
+        batches = {tuple(picks(rotation, 5)) for _ in range(10)}
+        self.assertGreater(len(batches), 1)
+
+    def test_peek_is_what_next_returns(self):
+        rotation = playlist.Playlist([f's{i}' for i in range(10)], min_distance=3, seed=9)
+        for _ in range(25):
+            upcoming = rotation.peek()
+            self.assertEqual(rotation.next(), upcoming)
+
+
+class RestoreTest(unittest.TestCase):
+    def test_restore_continues_the_batch(self):
+        rotation = playlist.Playlist(list('abcdef'), min_distance=2, seed=4)
+        rotation.restore(3, ['a', 'b', 'c'], ['b', 'c'])
+        self.assertEqual(rotation.remaining(), 3)
+        rest = picks(rotation, 3)
+        self.assertEqual(sorted(rest), ['d', 'e', 'f'])
+        self.assertEqual(rotation.picked_batch, 3)
+        rotation.next()
+        self.assertEqual(rotation.picked_batch, 4)
+
+    def test_restore_drops_shaders_no_longer_in_the_library(self):
+        # 'gone' was deleted after the checkpoint; with 'c' the only pick left and still
+        # cooling down, the fallback walks 'recent' and must not trip over it
+        rotation = playlist.Playlist(list('abcd'), min_distance=2, seed=1)
+        rotation.restore(1, ['a', 'b', 'd'], ['gone', 'c'])
+        self.assertNotIn('gone', rotation.recent)
+        self.assertEqual(rotation.next(), 'c')
+        self.assertEqual(len([rotation.next() for _ in range(8)]), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()